@@ -0,0 +1,340 @@
+"""
+Offline benchmarks for the simulator: no OpenAI or Lilac calls, no API keys.
+
+OpenAI is replaced by StubOpenAI, which answers each prompt type with a canned response,
+and Lilac by the mock server's MockOrderAgent (in process, or over HTTP through
+LilacApiClient and start_server_in_thread). Both take a latency spec like the mock server.
+
+    python src/benchmark.py --output bench.json
+    python src/benchmark.py --quick --baseline bench.json   # compare against a saved run
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from typing import Dict, List, Optional
+
+from conversation_orchestrator import ConversationOrchestrator
+from lilac_api_client import LilacApiClient
+from main import run_parallel_simulations, run_simulation
+from mock_lilac_server import LatencyModel, MockOrderAgent, start_server_in_thread
+from order_goal_generator import OrderGoalGenerator
+from order_matching import diff_orders, score_orders
+from results_sink import ResultsSink, read_results
+
+BASELINE_VERSION = 1
+# The mock agent doesn't understand every phrasing, so cap conversations that stall
+MAX_TURNS = 20
+# Relative change beyond which a metric is reported as a regression or improvement
+DEFAULT_TOLERANCE = 0.10
+
+class StubOpenAI:
+    """
+    Stand-in for AsyncOpenAI's chat.completions.create that recognizes the orchestrator's prompts.
+    The customer orders each goal item with its options and answers option questions with the
+    first listed choice; an item completes when the staff confirms it, and 'pull forward' ends
+    the conversation, so simulations finish in a handful of turns.
+    """
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    async def _create(self, model: str, messages: List[Dict], stream: bool = False, **params):
+        self.calls += 1
+        delay = self.latency.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        content = self._respond(messages[0]["content"], messages[-1]["content"])
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        usage = types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4,
+                                      total_tokens=prompt_tokens + len(content) // 4)
+        if stream:
+            return self._stream(content, usage, delay)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))],
+            usage=usage
+        )
+
+    @staticmethod
+    async def _stream(content: str, usage, first_token_delay: float):
+        """Emit word-sized chunks, spreading generation time like a model decoding, then the usage chunk."""
+        words = re.findall(r"\S+\s*", content)
+        for word in words:
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=word))],
+                                        usage=None)
+            if first_token_delay > 0:
+                await asyncio.sleep(first_token_delay / 10)
+        yield types.SimpleNamespace(choices=[], usage=usage)
+
+    def _respond(self, system: str, user: str) -> str:
+        if "You are a CUSTOMER" in system:
+            return self._customer_message(user)
+        if "JSON" in system:
+            return json.dumps({"needs_response": "would you like" in user.lower(),
+                               "conversation_ending": "pull forward" in user.lower(),
+                               "answered_questions": [], "item_completed": True, "next_state": "ORDER"})
+        if "should end" in system:
+            return str("pull forward" in user.lower()).lower()
+        if "requires a customer response" in system:
+            return str("would you like" in user.split("\n")[0].lower()).lower()
+        if "next state" in system:
+            remaining = re.search(r"Remaining items to order: (.*)", user)
+            return "ORDER" if remaining and remaining.group(1).strip() != "none" else "PRE-DONE"
+        if "Analyze both" in system:
+            added = re.search(r"I've added the (.+?)\.", user)
+            return f"- new_item: {added.group(1)}" if added else ""
+        if "Intended order" in user:
+            return str("new_item" in user.split("Current item:")[-1]).lower()
+        # Validity and question-answered checks pass
+        return "true"
+
+    @staticmethod
+    def _customer_message(user: str) -> str:
+        order = re.search(r"complete final order: (.+?)(?: \(([^()]+: [^()]*)\))?$", user, re.M)
+        if order:
+            values = re.findall(r"(?:: |, )([^;,]+)", order.group(2) or "")
+            return f"Can I get a {order.group(1)}" + (f" with {', '.join(values)}" if values else "") + "?"
+        question = re.search(r"Respond to: (.+?)\. IMPORTANT", user, re.S)
+        if question:
+            choice = re.search(r"We have ([^,]+)", question.group(1))
+            if "a la carte" in question.group(1):
+                return "A la carte, please."
+            return f"{choice.group(1)}, please." if choice else "That's all, thanks."
+        if "Verify the chat history" in user:
+            return "That's all, thanks."
+        return "Hi there!"
+
+class StubLilacClient:
+    """In-process Lilac backend backed by MockOrderAgent, with optional per-call latency."""
+    def __init__(self, agent: Optional[MockOrderAgent] = None, latency: Optional[LatencyModel] = None):
+        self.agent = agent or MockOrderAgent()
+        self.latency = latency or LatencyModel()
+
+    async def _wait(self):
+        delay = self.latency.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def start_order(self):
+        await self._wait()
+        return self.agent.start()
+
+    async def send_chat_message(self, order_id, message):
+        await self._wait()
+        return self.agent.chat(order_id, message)
+
+    async def retrieve_order(self, order_id):
+        await self._wait()
+        return self.agent.get_order(order_id)
+
+    async def aclose(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+def _orchestrator_kwargs(openai_latency: LatencyModel) -> Dict:
+    return {"pacing": "none", "max_turns": MAX_TURNS, "openai_client": StubOpenAI(openai_latency)}
+
+def bench_turn_overhead(simulations: int = 20, complexity: str = "complex", seed: int = 0) -> Dict:
+    """Process CPU spent per conversation turn with zero-latency backends (includes the stubs)."""
+    lilac_client = StubLilacClient()
+    kwargs = _orchestrator_kwargs(LatencyModel())
+    turns = matches = 0
+
+    async def run():
+        nonlocal turns, matches
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.jsonl")
+            with ResultsSink(path) as sink:
+                for i in range(simulations):
+                    await run_simulation(complexity, kwargs, lilac_client=lilac_client,
+                                         sink=sink, simulation_id=i, verbose=False, seed=seed + i)
+            records = list(read_results(path))
+            turns = sum(record["timings"]["turns"] for record in records)
+            matches = sum(record["match"] for record in records)
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    asyncio.run(run())
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return {
+        "turns": turns,
+        "match_rate": round(matches / simulations, 3),
+        "cpu_ms_per_turn": round(1000 * cpu / max(turns, 1), 3),
+        "wall_ms_per_turn": round(1000 * wall / max(turns, 1), 3),
+        "openai_calls_per_turn": round(kwargs["openai_client"].calls / max(turns, 1), 2)
+    }
+
+def bench_throughput(worker_counts=(1, 4, 16), simulations: int = 32, complexity: str = "simple",
+                     openai_latency: str = "fixed:0.05", lilac_latency: str = "fixed:0.05",
+                     http: bool = True, seed: int = 0) -> Dict:
+    """Simulations per second through run_parallel_simulations for each worker count."""
+    results = {}
+    for workers in worker_counts:
+        server = None
+        if http:
+            server = start_server_in_thread(latency=LatencyModel.parse(lilac_latency, seed))
+            lilac_client = LilacApiClient(base_url=server.base_url)
+        else:
+            lilac_client = StubLilacClient(latency=LatencyModel.parse(lilac_latency, seed))
+        kwargs = _orchestrator_kwargs(LatencyModel.parse(openai_latency, seed))
+        try:
+            with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                asyncio.run(run_parallel_simulations(
+                    simulations, workers, complexity, kwargs,
+                    results_path=os.path.join(tmp, "results.jsonl"), lilac_client=lilac_client, seed=seed
+                ))
+                elapsed = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        results[f"workers_{workers}_sims_per_sec"] = round(simulations / elapsed, 3)
+    return results
+
+def bench_memory(conversations: int = 50, complexity: str = "complex", seed: int = 0) -> Dict:
+    """Peak traced memory per conversation with all of them in flight at once."""
+    lilac_client = StubLilacClient(latency=LatencyModel("fixed", [0.01]))
+    openai_client = StubOpenAI(LatencyModel("fixed", [0.01]))
+    generator = OrderGoalGenerator(seed)
+    goals = [generator.generate_complex_order() if complexity == "complex" else generator.generate_simple_order()
+             for _ in range(conversations)]
+
+    async def run():
+        orchestrators = [ConversationOrchestrator(lilac_client, pacing="none", max_turns=MAX_TURNS,
+                                                  openai_client=openai_client, seed=seed + i)
+                         for i in range(conversations)]
+        order_ids = [await lilac_client.start_order() for _ in range(conversations)]
+        await asyncio.gather(*(o.run_conversation(order_id, copy.deepcopy(goal))
+                               for o, order_id, goal in zip(orchestrators, order_ids, goals)))
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    asyncio.run(run())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"conversations": conversations, "peak_bytes_per_conversation": (peak - baseline) // conversations}
+
+def bench_goal_generation(n: int = 5000, seed: int = 0) -> Dict:
+    generator = OrderGoalGenerator(seed)
+    start = time.perf_counter()
+    for _ in range(n):
+        generator.generate_complex_order()
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    generator.generate_batch(n, "complex", seed)
+    batch = time.perf_counter() - start
+    return {"complex_goals_per_sec": round(n / single, 1), "batch_goals_per_sec": round(n / batch, 1)}
+
+def bench_compare_orders(n: int = 5000, seed: int = 0) -> Dict:
+    generator = OrderGoalGenerator(seed)
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(n):
+        goal = generator.generate_complex_order()
+        final = copy.deepcopy(goal)
+        rng.shuffle(final)
+        if final and rng.random() < 0.3:
+            final.pop()
+        pairs.append((goal, final))
+    start = time.perf_counter()
+    for goal, final in pairs:
+        diff_orders(goal, final)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    score_orders(pairs)
+    bulk = time.perf_counter() - start
+    return {"compare_orders_per_sec": round(n / single, 1), "score_orders_per_sec": round(n / bulk, 1)}
+
+def run_benchmarks(quick: bool = False, http: bool = True) -> Dict:
+    scale = 0.2 if quick else 1.0
+    results = {}
+    benchmarks = {
+        "goal_generation": lambda: bench_goal_generation(int(5000 * scale)),
+        "compare_orders": lambda: bench_compare_orders(int(5000 * scale)),
+        "turn_overhead": lambda: bench_turn_overhead(max(2, int(20 * scale))),
+        "memory": lambda: bench_memory(max(5, int(50 * scale))),
+        "throughput": lambda: bench_throughput(simulations=max(4, int(32 * scale)), http=http),
+    }
+    for name, bench in benchmarks.items():
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = bench()
+    return {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": results
+    }
+
+def _higher_is_better(metric: str) -> Optional[bool]:
+    if metric.endswith("_per_sec"):
+        return True
+    if metric.endswith(("_ms_per_turn", "_bytes_per_conversation", "_calls_per_turn")):
+        return False
+    return None  # informational, e.g. counts
+
+def compare(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """Per-metric change against a baseline; status is 'regression', 'improvement' or 'ok'."""
+    rows = []
+    for bench, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            better = _higher_is_better(metric)
+            old = baseline.get("results", {}).get(bench, {}).get(metric)
+            if better is None or not old:
+                continue
+            change = (value - old) / old
+            status = "ok"
+            if abs(change) > tolerance:
+                status = "improvement" if (change > 0) == better else "regression"
+            rows.append({"benchmark": bench, "metric": metric, "baseline": old, "current": value,
+                         "change": round(change, 4), "status": status})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with stubbed OpenAI and Lilac backends")
+    parser.add_argument("--output", help="write results as JSON (use as a later --baseline)")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative change counted as a regression (default 0.10)")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--in-process", action="store_true",
+                        help="throughput without HTTP: call the mock agent directly")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.quick, http=not args.in_process)
+    print(json.dumps(report["results"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        for row in rows:
+            print(f"{row['status']:<12}{row['benchmark'] + '.' + row['metric']:<50}"
+                  f"{row['baseline']:>12} -> {row['current']:<12}{row['change']:+.1%}")
+        if any(row["status"] == "regression" for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict, deque
+from typing import Dict
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when the cassette has no recorded response left for a request."""
+
+class Cassette:
+    """
+    Records Lilac and OpenAI interactions to a gzipped JSONL file and replays them with no network.
+    In replay, a request must match a recorded one exactly (kind, call site, model, messages and
+    parameters), so a change to prompts or routing fails loudly instead of serving another
+    call's response; re-record cassettes after such changes.
+    """
+    MODES = ("record", "replay")
+
+    def __init__(self, path: str, mode: str = "record"):
+        if mode not in self.MODES:
+            raise ValueError(f"Cassette mode must be one of {self.MODES}, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.interactions = []
+        self._by_hash = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def _hash(kind: str, request: Dict) -> str:
+        payload = json.dumps({"kind": kind, "request": request}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            self.interactions = [json.loads(line) for line in f if line.strip()]
+        for i, interaction in enumerate(self.interactions):
+            self._by_hash[interaction["h"]].append(i)
+
+    def record(self, kind: str, request: Dict, response: Dict):
+        """Append an interaction; request must be JSON-serializable."""
+        self.interactions.append({"k": kind, "h": self._hash(kind, request), "q": request, "r": response})
+
+    def play(self, kind: str, request: Dict) -> Dict:
+        """Return the recorded response for a request; identical requests get their responses in recorded order."""
+        queue = self._by_hash.get(self._hash(kind, request))
+        if not queue:
+            call_site = f" ({request['call_site']})" if "call_site" in request else ""
+            raise CassetteMiss(f"No recorded {kind}{call_site} interaction matches the request in {self.path}; "
+                               "re-record the cassette if prompts or routes changed")
+        return self.interactions[queue.popleft()]["r"]
+
+    def save(self):
+        """Write recorded interactions to disk. No-op in replay mode."""
+        if self.mode != "record":
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for interaction in self.interactions:
+                f.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+
+class CassetteLilacClient:
+    """
+    Wraps a LilacApiClient to record its responses, or replays them when client is None.
+    /chat returns the whole message history every turn, so only the messages added since the
+    previous turn are recorded ('new_messages'), and the history is rebuilt on replay.
+    """
+    def __init__(self, cassette: Cassette, client=None):
+        if client is None and not cassette.replaying:
+            raise ValueError("A client is required to record a cassette")
+        self.cassette = cassette
+        self.client = client
+        self._messages = []  # the conversation's message history so far
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def start_order(self):
+        if self.cassette.replaying:
+            return self.cassette.play("start_order", {})["orderId"]
+        order_id = await self.client.start_order()
+        self.cassette.record("start_order", {}, {"orderId": order_id})
+        return order_id
+
+    async def send_chat_message(self, order_id, message):
+        # order_id differs between runs, so only the message is part of the request
+        request = {"input": message}
+        if self.cassette.replaying:
+            recorded = dict(self.cassette.play("send_chat_message", request))
+            if "new_messages" in recorded:
+                recorded["messages"] = self._messages + recorded.pop("new_messages")
+            self._messages = list(recorded.get("messages", []))
+            return recorded
+        response = await self.client.send_chat_message(order_id, message)
+        messages = response.get("messages", [])
+        seen = len(self._messages)
+        if messages[:seen] == self._messages:
+            recorded = {key: value for key, value in response.items() if key != "messages"}
+            recorded["new_messages"] = messages[seen:]
+        else:
+            # The history changed under us; record it whole
+            recorded = response
+        self.cassette.record("send_chat_message", request, recorded)
+        self._messages = list(messages)
+        return response
+
+    async def retrieve_order(self, order_id):
+        if self.cassette.replaying:
+            return self.cassette.play("retrieve_order", {})
+        response = await self.client.retrieve_order(order_id)
+        self.cassette.record("retrieve_order", {}, response)
+        return response
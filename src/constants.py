@@ -1,12 +1,34 @@
 import os
 from dotenv import load_dotenv
 import json
+import threading
 
 load_dotenv()
 
 API_BASE_URL = os.getenv('LILAC_API_BASE_URL', "https://test.lilaclabs.ai/lilac-agent")
 API_TOKEN = os.getenv('LILAC_API_TOKEN')
 
-# Load the actual menu from the provided JSON file
-with open('provided/menu.json', 'r') as f:
-    MENU_JSON = json.load(f)
+# Resolve the menu relative to the repo rather than the working directory, or take it from the environment
+MENU_PATH = os.getenv(
+    'LILAC_MENU_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'provided', 'menu.json')
+)
+
+_menu_json = None
+_menu_lock = threading.Lock()
+
+def get_menu_json():
+    """Load the actual menu on first use, so processes that never touch it don't pay the parse."""
+    global _menu_json
+    if _menu_json is None:
+        with _menu_lock:
+            if _menu_json is None:
+                with open(MENU_PATH, 'r') as f:
+                    _menu_json = json.load(f)
+    return _menu_json
+
+def __getattr__(name):
+    # Keep `from constants import MENU_JSON` working, loaded lazily
+    if name == 'MENU_JSON':
+        return get_menu_json()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
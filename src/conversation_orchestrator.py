@@ -1,10 +1,58 @@
 import random
+import re
+from collections import Counter
 from typing import List, Dict, Tuple, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError
 import os
-import time
+import asyncio
 import logging
-from datetime import datetime
+import threading
+import time
+import weakref
+from cassette import CassetteMiss
+from metrics import get_metrics
+from model_routing import RoutingTable, load_routes
+from log_pipeline import ensure_logging, set_log_context
+from order_matching import count_matches
+from pacing import make_pacing
+from prompt_encoding import DEFAULT_PROMPT_BUDGET, PROMPT_TOKEN_BUDGETS, compact_text, encode_build, encode_item, encode_items, estimate_tokens, fit_to_budget
+from scheduler import get_scheduler, is_throttle, status_of
+from turn_analysis import SYSTEM_PROMPT as TURN_ANALYSIS_PROMPT, build_user_prompt as build_turn_analysis_prompt, parse_turn_analysis
+
+# One OpenAI client (and its connection pool) per event loop, shared by every orchestrator on that loop
+_shared_openai_clients = weakref.WeakKeyDictionary()
+_shared_openai_lock = threading.Lock()
+
+def get_shared_openai_client() -> AsyncOpenAI:
+    """Return the process-wide OpenAI client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _shared_openai_lock:
+        client = _shared_openai_clients.get(loop)
+        if client is None or client.is_closed():
+            api_key = os.getenv('OPENAI_API_KEY')
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY environment variable must be set")
+            # Retries are handled in _chat_completion so the shared scheduler sees every 429
+            client = AsyncOpenAI(api_key=api_key, max_retries=0)
+            _shared_openai_clients[loop] = client
+        return client
+
+def is_retryable(e: BaseException) -> bool:
+    """429s, 5xx and connection failures are retried with backoff; anything else fails the call."""
+    status = status_of(e)
+    return is_throttle(e) or (status is not None and status >= 500) or \
+        isinstance(e, (APIConnectionError, APITimeoutError))
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, capped at 30 seconds."""
+    return min(30, 2 ** attempt) * (0.5 + random.random())
+
+async def close_shared_openai_client():
+    """Close the shared OpenAI client for the running event loop, e.g. at the end of a batch."""
+    with _shared_openai_lock:
+        client = _shared_openai_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
 
 class ConversationOrchestrator:
     EMOTIONS = [
@@ -21,35 +69,78 @@ class ConversationOrchestrator:
         "short", "normal", "long", "minimal",
         "chatty", "mumbled", "clear", "rushed"
     ]
+    # Scheduler priorities per call site (lower runs first); the customer message blocks the Lilac send
+    CALL_PRIORITIES = {
+        "customer_message": 0,
+        "is_response_valid": 1,
+        "track_item_construction": 2,
+        # Speculative drafts only use capacity nothing else is waiting for
+        "customer_message_draft": 9
+    }
+    MAX_API_RETRIES = 4
+    # Where a streamed customer message can be cut into separately validated utterances
+    UTTERANCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+    # Item tracking sees the running item build plus a bounded window of recent context,
+    # so its prompt stays the same size however long the conversation gets
+    TRACKING_CONTEXT_EXCHANGES = 2
+    TRACKING_CONTEXT_CHARS = 600
 
-    def __init__(self, lilac_client):
-        # Set up logging
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_file = f"{log_dir}/conversation_{timestamp}.log"
-        
-        # Configure logging
+    def __init__(self, lilac_client, structured_analysis: bool = False, response_cache=None, cassette=None,
+                 pacing=None, ground_in_order_state: bool = False, order_check_interval: int = 1,
+                 openai_client=None, max_turns: Optional[int] = None, streaming: bool = False,
+                 speculative: bool = False, model_routes=None, seed: Optional[int] = None):
+        # All orchestrators share one queued pipeline writing to the current run's log file
+        ensure_logging()
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-        
-        # File handler
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-        
+
         # Initialize other attributes
         self.lilac_client = lilac_client
+        # One JSON classifier call per turn instead of one call per question
+        self.structured_analysis = structured_analysis
+        # Optional ResponseCache (or anything with make_key/get/set) for temperature=0 calls
+        self.response_cache = response_cache
+        # Optional Cassette to record completions to, or replay them from without network
+        self.cassette = cassette
+        # A replay mismatch, kept so the per-call fallbacks can't swallow it
+        self._replay_error = None
+        # Style and question topics; seeded from the cassette so replays build the recorded prompts
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # Think time before each turn: a PacingPolicy, seconds, or 'none' / 'fixed:S' / 'human'
+        self.pacing = make_pacing(pacing)
+        # Track items from Lilac's live order every order_check_interval turns instead of asking GPT-4
+        self.ground_in_order_state = ground_in_order_state
+        self.order_check_interval = max(1, order_check_interval)
+        self.order_id = None
+        self._turns_since_order_check = 0
+        # Stop runaway conversations after this many customer turns (None: no limit)
+        self.max_turns = max_turns
+        # Stream customer messages and validate them utterance by utterance
+        self.streaming = streaming
+        self._first_token_time = None
+        # Draft the likely next customer message while waiting on the agent
+        # (not with cassettes, whose replay order can't depend on which drafts get used)
+        self.speculative = speculative and cassette is None
+        self._draft = None  # (key, task, estimated tokens) of the outstanding draft
+        self._draft_started = False  # whether the scheduler has sent the outstanding draft
+        # Per turn: time to first token (streaming only) and time until the message was ready to send
+        self.turn_timings = []
+        # OpenAI calls and token usage for this conversation, reported with its results
+        self.usage = Counter()
+        # Model, timeout and fallback models per call site: a RoutingTable, or overrides of the defaults
+        self.routes = model_routes if isinstance(model_routes, RoutingTable) else load_routes(model_routes)
         self.api_key = os.getenv('OPENAI_API_KEY')
-        if not self.api_key:
-            self.logger.error("OPENAI_API_KEY environment variable not set")
-            raise ValueError("OPENAI_API_KEY environment variable must be set")
-            
-        self.openai_client = OpenAI(api_key=self.api_key)
+        if cassette is not None and cassette.replaying:
+            self.openai_client = None
+        elif openai_client is not None:
+            # e.g. a stub backend for benchmarks
+            self.openai_client = openai_client
+        else:
+            if not self.api_key:
+                self.logger.error("OPENAI_API_KEY environment variable not set")
+                raise ValueError("OPENAI_API_KEY environment variable must be set")
+            # The event loop's shared client, closed with close_shared_openai_client()
+            self.openai_client = get_shared_openai_client()
         self.conversation_context = {
             "ordered_items": [],
             "current_item": None,
@@ -63,107 +154,263 @@ class ConversationOrchestrator:
         
         self.logger.info("ConversationOrchestrator initialized")
 
-    def run_conversation(self, order_id: str, order_goal: List[Dict]) -> List[Dict]:
+    async def run_conversation(self, order_id: str, order_goal: List[Dict]) -> List[Dict]:
         """Simulate a natural customer conversation flow"""
-        self.logger.info(f"NEW CHAT\n\n")
+        self.logger.info("NEW CHAT\n\n")
+        self.order_id = order_id
+        self._turns_since_order_check = 0
+        set_log_context(order_id=order_id, turn=0)
         self.conversation_context["chat_history"] = []  # Reset chat history at start
         messages_log = []
         self.conversation_context["order_goal"] = order_goal
         self.conversation_context["current_item"] = order_goal[0] if order_goal else None
+        self._seed_rng()
         self.conversation_context["conversation_style"] = self._pick_random_style()
         state = "GREET"
+        turn = 0
         
-        self.logger.info(f"Starting conversation with order_id: {order_id}")
-        self.logger.debug(f"Initial conversation context: {self.conversation_context}")
+        self.logger.info("Starting conversation with order_id: %s", order_id)
+        self.logger.debug("Initial conversation context: %s", self.conversation_context)
         while state != "DONE":
-            self.logger.info(f"\n\nNEW CHAT")
+            turn += 1
+            if self.max_turns is not None and turn > self.max_turns:
+                self.logger.warning("Stopping conversation after %s turns", self.max_turns)
+                break
+            set_log_context(turn=turn)
+            self.logger.info("\n\nNEW CHAT")
             try:
-                time.sleep(1)
-                self.logger.debug(f"Current state: {state}")
-                customer_message = self._generate_customer_message(state)
-                self.logger.info(f"Generated customer message: {customer_message}")
-                
-                # Check all pending questions against this response
-                if self.conversation_context["pending_questions"]:
-                    # Create a copy since we'll be modifying the list
-                    questions = self.conversation_context["pending_questions"].copy()
-                    for question in questions:
-                        self._is_question_answered(question, customer_message)
+                await self.pacing.wait(state)
+                self.logger.debug("Current state: %s", state)
+                generation_start = time.monotonic()
+                self._first_token_time = None
+                customer_message = await self._generate_customer_message(state)
+                self._check_replay()
+                self._record_turn_timing(turn, time.monotonic() - generation_start)
+                self.logger.info("Generated customer message: %s", customer_message)
                 
-                response = self.lilac_client.send_chat_message(order_id, customer_message)
-                self.logger.debug(f"Received response: {response}")
+                # Check all pending questions against this response while the agent replies,
+                # unless the structured turn analysis will answer them
+                # Create a copy since we'll be modifying the list
+                questions = [] if self.structured_analysis else self.conversation_context["pending_questions"].copy()
+                if self.speculative:
+                    self._start_draft(state)
+                response, *_ = await asyncio.gather(
+                    self.lilac_client.send_chat_message(order_id, customer_message),
+                    *(self._is_question_answered(question, customer_message) for question in questions)
+                )
+                self.logger.debug("Received response: %s", response)
+                agent_message = response["messages"][-1]["content"]
                 
                 messages_log.extend([
                     {"role": "user", "content": customer_message},
-                    {"role": "assistant", "content": response["messages"][-1]["content"]}
+                    {"role": "assistant", "content": agent_message}
                 ])
 
-                self._update_conversation_context(response["messages"][-1]["content"], customer_message)
-                state = self._get_next_state(state)
-                self.logger.debug(f"Updated conversation context: {self.conversation_context}")
-                self.logger.debug(f"Next state: {state}")
+                analysis = await self._update_conversation_context(agent_message, customer_message, state)
+                state = await self._get_next_state(state, analysis)
+                self._check_replay()
+                self.logger.debug("Updated conversation context: %s", self.conversation_context)
+                self.logger.debug("Next state: %s", state)
 
+            except CassetteMiss:
+                self._discard_draft()
+                raise
             except Exception as e:
-                self.logger.error(f"Error in conversation loop: {e}", exc_info=True)
+                self.logger.error("Error in conversation loop: %s", e, exc_info=True)
                 state = "DONE"
                 break
 
+        self._discard_draft()
         self.logger.info("Conversation completed")
         return messages_log
 
-    def _generate_customer_message(self, state: str) -> str:
+    def _seed_rng(self):
+        """Record the conversation's random seed, or take the recorded one when replaying."""
+        if self.cassette is None:
+            return
+        if self.cassette.replaying:
+            seed = self.cassette.play("rng", {})["seed"]
+        else:
+            seed = self.seed if self.seed is not None else random.randrange(2 ** 31)
+            self.cassette.record("rng", {}, {"seed": seed})
+        self.rng.seed(seed)
+
+    def _check_replay(self):
+        """Fail the conversation on a replay mismatch instead of continuing on a fallback answer."""
+        if self._replay_error is not None:
+            raise self._replay_error
+
+    def _record_turn_timing(self, turn: int, time_to_send: float):
+        timing = {"turn": turn, "time_to_send": round(time_to_send, 3)}
+        metrics = get_metrics()
+        metrics.record_call("turn.time_to_send", time_to_send)
+        if self._first_token_time is not None:
+            timing["time_to_first_token"] = round(self._first_token_time, 3)
+            metrics.record_call("turn.time_to_first_token", self._first_token_time)
+        self.turn_timings.append(timing)
+
+    async def _generate_customer_message(self, state: str) -> str:
         """Generate a contextually appropriate customer message"""
         style = self.conversation_context["conversation_style"]
-        self.logger.debug(f"Using conversation style: {style}")
+        self.logger.debug("Using conversation style: %s", style)
         
-        system_prompt = self._build_system_prompt(state, style)
         user_prompt = self._build_user_prompt(state)
+        system_prompt = self._build_system_prompt(state, style, user_prompt=user_prompt)
         
-        self.logger.debug(f"System prompt: {system_prompt}")
-        self.logger.debug(f"User prompt: {user_prompt}")
+        self.logger.debug("System prompt: %s", system_prompt)
+        self.logger.debug("User prompt: %s", user_prompt)
         
-        response = self._get_gpt4_response(system_prompt, user_prompt)
+        draft = await self._take_draft(state)
+        if draft is not None:
+            response = draft
+            valid = await self._is_response_valid(response)
+        elif self.streaming:
+            response, valid = await self._stream_customer_message(system_prompt, user_prompt)
+        else:
+            response = await self._get_gpt4_response(system_prompt, user_prompt)
+            valid = await self._is_response_valid(response)
         
         # Validate the response doesn't try to order unauthorized items
-        if not self._is_response_valid(response):
+        if not valid:
             self.logger.warning("Generated response contained unauthorized orders, regenerating...")
             # Try again with a more explicit warning
             system_prompt += "\nWARNING: DO NOT ORDER ANY ITEMS. ONLY ASK QUESTIONS OR PROVIDE CLARIFICATION."
-            response = self._get_gpt4_response(system_prompt, user_prompt)
+            response = await self._get_gpt4_response(system_prompt, user_prompt)
         
-        self.logger.info(f"GPT-4 response: {response}")
+        self.logger.info("GPT-4 response: %s", response)
         return response
 
-    def _build_system_prompt(self, state: str, style: Dict) -> str: # clarify the structure of the order, an order will look like...
-        base_prompt = f"""
-        You are a CUSTOMER ordering food at a drive-through restaurant.
-        Current conversation state: {state}
-        Emotion: {style['emotion']}
-        Tone: {style['tone']}
-        Brevity: {style['brevity']}
-        
-        Conversation Context:
-        - ORDER LIST: {self.conversation_context["order_goal"]}
-        - Current item to order: {self.conversation_context["current_item"]}
-        - Building item: {self.conversation_context["items_in_progress"]}
-        - Items already ordered: {self.conversation_context["ordered_items"]}
-        - Pending questions from staff: {self.conversation_context["pending_questions"]}
-        - Last staff message: {self.conversation_context["last_agent_message"]}
-
-        NEVER ORDER SOMETHING NOT PROVIDED IN THE ORDER LIST. NEVER ADD EVEN TOPPINGS OR CUSTOMIZATIONS THAT ARE NOT PROVIDED IN THE ORDER LIST.
-        ALWAYS USE THE PROPER NAMES FOR ITEMS AND OPTIONS.
-
-        IMPORTANT:
-        You are trying to order specific items but should act natural and spontaneous.
-        Even though we have a list of items to order, act as if you don't know the menu.
-        NEVER ORDER THE ENTIRE ITEM IN ONE MESSAGE.
-        Customizations are only deviations from the basic item.
-        Mention customizations but if there's a lot. Do them incrementally.
-
-        Only respond with the exact words a customer would say - no explanations or meta commentary.
-        If there's a mixup, ask the staff to clarify.
+    async def _stream_customer_message(self, system_prompt: str, user_prompt: str) -> Tuple[str, bool]:
+        """
+        Stream the customer message and validate each utterance as soon as its sentence ends,
+        while the rest is still generating. Returns the message and whether every utterance passed.
         """
+        start = time.monotonic()
+        self._first_token_time = None
+        checks = []
+        text = ""
+        try:
+            async for delta in self._stream_completion(
+                "customer_message",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.7,
+                presence_penalty=-0.1,
+                frequency_penalty=0.1
+            ):
+                if self._first_token_time is None:
+                    self._first_token_time = time.monotonic() - start
+                text += delta
+                *utterances, text = self.UTTERANCE_BOUNDARY.split(text)
+                for utterance in utterances:
+                    checks.append((utterance, asyncio.ensure_future(self._is_response_valid(utterance))))
+        except Exception as e:
+            for _, check in checks:
+                check.cancel()
+            self.logger.error("Error streaming customer message: %s", e, exc_info=True)
+            response = await self._get_gpt4_response(system_prompt, user_prompt)
+            return response, await self._is_response_valid(response)
 
+        if text.strip():
+            checks.append((text, asyncio.ensure_future(self._is_response_valid(text))))
+        results = await asyncio.gather(*(check for _, check in checks))
+        response = " ".join(utterance.strip() for utterance, _ in checks)
+        return response, all(results)
+
+    def _speculation_key(self, state: str, context: Dict) -> Tuple:
+        """What a draft depends on besides the staff's exact words: state, current item and what's left."""
+        item = context["current_item"]
+        return (state, item and item["itemName"], item and repr(item["optionValues"]),
+                len(context["order_goal"]), bool(context["pending_questions"]))
+
+    def _predict_next(self, state: str) -> Optional[Tuple[str, Dict]]:
+        """
+        Guess the state and context after the staff replies: the greeting is followed by ordering
+        the current item, and an order or answer by the staff confirming the item, which moves on
+        to the next item or, after the last one, to wrapping up. Other turns aren't predicted.
+        """
+        context = self.conversation_context
+        if context["current_item"] is None or context["pending_questions"]:
+            return None
+        if state == "GREET":
+            return "ORDER", {**context, "last_agent_message": None}
+        if state not in ("ORDER", "CLARIFY"):
+            return None
+        current_item = context["current_item"]
+        remaining = [
+            item for item in context["order_goal"]
+            if not (item["itemName"] == current_item["itemName"] and item["optionValues"] == current_item["optionValues"])
+        ]
+        predicted = {
+            **context,
+            "ordered_items": context["ordered_items"] + [current_item],
+            "items_in_progress": [],
+            "order_goal": remaining,
+            "current_item": remaining[0] if remaining else None,
+            "last_agent_message": None
+        }
+        return ("ORDER" if remaining else "PRE-DONE"), predicted
+
+    def _start_draft(self, state: str):
+        """Start drafting the predicted next customer message in the background."""
+        self._discard_draft()
+        prediction = self._predict_next(state)
+        if prediction is None:
+            return
+        next_state, context = prediction
+        user_prompt = self._build_user_prompt(next_state, context)
+        system_prompt = self._build_system_prompt(next_state, context["conversation_style"], context, user_prompt,
+                                                  "customer_message_draft")
+        # Not _get_gpt4_response: its canned fallback would be committed as if the draft had succeeded
+        self._draft_started = False
+        task = asyncio.ensure_future(self._customer_completion(system_prompt, user_prompt, "customer_message_draft"))
+        self._draft = (self._speculation_key(next_state, context), task,
+                       estimate_tokens(system_prompt) + estimate_tokens(user_prompt))
+        self.usage["speculative_drafts"] += 1
+        get_metrics().increment("speculation", "drafts")
+
+    async def _take_draft(self, state: str) -> Optional[str]:
+        """Commit the outstanding draft if the prediction came true, otherwise throw it away."""
+        if self._draft is None:
+            return None
+        key, task, prompt_tokens = self._draft
+        if key != self._speculation_key(state, self.conversation_context):
+            self._discard_draft()
+            return None
+        self._draft = None
+        try:
+            draft = await task
+        except Exception as e:
+            self.logger.error("Speculative draft failed: %s", e, exc_info=True)
+            self.usage["speculative_misses"] += 1
+            get_metrics().increment("speculation", "misses")
+            return None
+        self.usage["speculative_hits"] += 1
+        get_metrics().increment("speculation", "hits")
+        self.logger.debug("Committed speculative draft for %s", state)
+        return draft
+
+    def _discard_draft(self):
+        if self._draft is None:
+            return
+        _, task, prompt_tokens = self._draft
+        self._draft = None
+        task.cancel()
+        # Estimated like the scheduler's budget: a draft cancelled after it was sent may still have
+        # spent its prompt; one cancelled while still queued in the scheduler cost nothing
+        wasted = 0
+        if self._draft_started:
+            wasted = prompt_tokens + (estimate_tokens(task.result() or "") if task.done() and not task.cancelled()
+                                      and task.exception() is None else 0)
+        self.usage["speculative_misses"] += 1
+        self.usage["speculative_wasted_tokens"] += wasted
+        get_metrics().increment("speculation", "misses")
+        get_metrics().increment("speculation", "wasted_tokens", wasted)
+
+    def _build_system_prompt(self, state: str, style: Dict, context: Optional[Dict] = None, user_prompt: str = "",
+                             call_site: str = "customer_message") -> str: # clarify the structure of the order, an order will look like...
         # Add context-specific instructions based on state
         state_contexts = {
             "GREET": "Generate a natural greeting.",
@@ -173,29 +420,61 @@ class ConversationOrchestrator:
             "PRE-DONE": "Indicate you're finished ordering.",
             "DONE": "Assistant or you has ended the conversation"
         }
-        
-        return f"{base_prompt}\n{state_contexts.get(state, '')}"
 
-    def _build_user_prompt(self, state: str) -> str:
-        context = self.conversation_context
+        def render(fields: Dict[str, str]) -> str:
+            return f"""
+            You are a CUSTOMER ordering food at a drive-through restaurant.
+            Current conversation state: {state}
+            Emotion: {style['emotion']}
+            Tone: {style['tone']}
+            Brevity: {style['brevity']}
+
+            Conversation Context:
+            - ORDER LIST: {fields["order_goal"]}
+            - Current item to order: {fields["current_item"]}
+            - Building item: {fields["items_in_progress"]}
+            - Items already ordered: {fields["ordered_items"]}
+            - Pending questions from staff: {fields["pending_questions"]}
+            - Last staff message: {fields["last_agent_message"]}
+
+            NEVER ORDER SOMETHING NOT PROVIDED IN THE ORDER LIST. NEVER ADD EVEN TOPPINGS OR CUSTOMIZATIONS THAT ARE NOT PROVIDED IN THE ORDER LIST.
+            ALWAYS USE THE PROPER NAMES FOR ITEMS AND OPTIONS.
+
+            IMPORTANT:
+            You are trying to order specific items but should act natural and spontaneous.
+            Even though we have a list of items to order, act as if you don't know the menu.
+            NEVER ORDER THE ENTIRE ITEM IN ONE MESSAGE.
+            Customizations are only deviations from the basic item.
+            Mention customizations but if there's a lot. Do them incrementally.
+
+            Only respond with the exact words a customer would say - no explanations or meta commentary.
+            If there's a mixup, ask the staff to clarify.
+
+            {state_contexts.get(state, '')}
+            """
+
+        return self._fit_prompt(call_site, render, context, user_prompt)
+
+    def _build_user_prompt(self, state: str, context: Optional[Dict] = None) -> str:
+        context = context or self.conversation_context
         
         if state == "ORDER" and context["current_item"]:
-            return f"See what is missing in 'Building item' to complete final order: {context['current_item']['itemName']} with options: {context['current_item'].get('optionValues', [])}"
+            return f"See what is missing in 'Building item' to complete final order: {encode_item(context['current_item'])}"
         elif state == "CLARIFY" and context["last_agent_message"]:
             return f"Respond to: {context['last_agent_message']}. IMPORTANT: DO NOT ORDER ANYTHING NOT IN THE ORDER LIST. IF SO, REMOVE IT"
         elif state == "QUESTION":
             # Pick something relevant to ask about
             topics = ["menu items", "prices", "customization options", "specials"]
-            return f"Ask about: {random.choice(topics)}"
+            return f"Ask about: {self.rng.choice(topics)}"
         elif state == "GREET":
             return "Generate a natural greeting."
         
-        if len(self.conversation_context["order_goal"]) == 0:
+        if len(context["order_goal"]) == 0:
             return "Verify the chat history matches the ordered items list. If needed, ask for clarification. Otherwise, end the conversation naturally."
         else:
             return "Continue the conversation naturally"
         
-    def _is_response_valid(self, response: str) -> bool:
+    async def _is_response_valid(self, response: str) -> bool:
         """Check if the response doesn't try to order unauthorized items"""
         try:
             system_prompt = """
@@ -210,14 +489,14 @@ class ConversationOrchestrator:
             """
             
             user_prompt = f"""
-            Order goal (remaining items to order): {self.conversation_context['order_goal']}
+            Order goal (remaining items to order): {encode_items(self.conversation_context['order_goal'])}
             Customer's response: {response}
 
             Does this response follow the rules?
             """
             
-            validation = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "is_response_valid",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -226,18 +505,167 @@ class ConversationOrchestrator:
                 max_tokens=10
             )
             
-            result = validation.choices[0].message.content.strip().lower()
-            self.logger.debug(f"Response validation result: {result}")
+            result = content.strip().lower()
+            self.logger.debug("Response validation result: %s", result)
             return result == "true"
         
         except Exception as e:
-            self.logger.error(f"Error in response validation: {e}", exc_info=True)
+            self.logger.error("Error in response validation: %s", e, exc_info=True)
             # Default to True on error to avoid blocking valid responses
             return True
 
-    def _update_conversation_context(self, agent_message: str, user_message: str):
-        """Update conversation context based on agent's response"""
-        self.logger.debug(f"Updating context with agent message: {agent_message}")
+    async def _analyze_turn(self, agent_message: str, user_message: str, current_state: str) -> Dict:
+        """
+        Run the per-turn classifiers that only read the latest exchange concurrently,
+        so a turn waits on the slowest call instead of the sum of them.
+        In structured mode a single JSON call replaces them, falling back to this path if it fails.
+        In grounded mode item completion comes from Lilac's live order rather than GPT-4.
+        """
+        if self.structured_analysis:
+            # The structured prompt needs the updated item build
+            grounded_complete = await self._refresh_item_state(agent_message, user_message)
+            analysis = await self._get_structured_turn_analysis(agent_message, user_message, current_state)
+            if analysis is not None:
+                if grounded_complete is not None:
+                    analysis["item_completed"] = grounded_complete
+                self.logger.debug("Structured turn analysis: %s", analysis)
+                return analysis
+            self.logger.warning("Structured turn analysis failed, falling back to per-call classifiers")
+            # Pending questions were not checked during the send, check them now
+            extra_checks = [
+                self._is_question_answered(question, user_message)
+                for question in self.conversation_context["pending_questions"].copy()
+            ]
+            needs_response, conversation_ending, *_ = await asyncio.gather(
+                self._needs_response(agent_message),
+                self._is_conversation_ending(agent_message),
+                *extra_checks
+            )
+        else:
+            needs_response, conversation_ending, grounded_complete = await asyncio.gather(
+                self._needs_response(agent_message),
+                self._is_conversation_ending(agent_message),
+                self._refresh_item_state(agent_message, user_message)
+            )
+
+        analysis = {
+            "needs_response": needs_response,
+            "conversation_ending": conversation_ending
+        }
+        if grounded_complete is not None:
+            analysis["item_completed"] = grounded_complete
+        self.logger.debug("Turn analysis: %s", analysis)
+        return analysis
+
+    async def _refresh_item_state(self, agent_message: str, user_message: str) -> Optional[bool]:
+        """
+        Update the item being built for the current goal item. In grounded mode this returns
+        whether the item is complete; otherwise GPT-4 tracks the build and this returns None.
+        On grounded turns between order lookups GPT-4 tracks the build and checks completion,
+        and a lookup is forced as soon as it reports the item confirmed.
+        """
+        if self.ground_in_order_state:
+            complete = await self._check_live_order()
+            if complete is not None:
+                return complete
+            await self._track_item_construction(agent_message, user_message)
+            if not await self._is_item_completed(agent_message, self.conversation_context["current_item"],
+                                                 self.conversation_context["items_in_progress"]):
+                return False
+            complete = await self._check_live_order(force=True)
+            # If the lookup failed, go with GPT-4's answer
+            return True if complete is None else complete
+        await self._track_item_construction(agent_message, user_message)
+        return None
+
+    async def _check_live_order(self, force: bool = False) -> Optional[bool]:
+        """
+        Diff Lilac's live order against the current goal item using the menu's option schema.
+        The item is complete once the order holds more copies of it than were already ordered.
+        Returns None when unknown: on turns skipped by order_check_interval (unless forced),
+        or when the order can't be retrieved.
+        """
+        self._turns_since_order_check += 1
+        if self._turns_since_order_check < self.order_check_interval and not force:
+            return None
+        self._turns_since_order_check = 0
+
+        current_item = self.conversation_context["current_item"]
+        if not current_item:
+            return False
+        try:
+            order_state = await self.lilac_client.retrieve_order(self.order_id)
+            live_items = order_state.get("order", [])
+        except Exception as e:
+            self.logger.error("Error retrieving live order: %s", e, exc_info=True)
+            return None
+
+        # Show the prompts what Lilac has for this item so far
+        building = [item for item in live_items if item["itemName"].lower() == current_item["itemName"].lower()]
+        self.conversation_context["items_in_progress"] = self._describe_item(building[-1]) if building else []
+
+        ordered = count_matches(current_item, self.conversation_context["ordered_items"])
+        complete = count_matches(current_item, live_items) > ordered
+        self.logger.debug("Live order check: complete=%s, live items=%s", complete, live_items)
+        return complete
+
+    @staticmethod
+    def _describe_item(item: Dict) -> List[str]:
+        """Render an order item in the same line format _track_item_construction produces."""
+        lines = [f"- new_item: {item['itemName']}"]
+        for key, values in zip(item.get("optionKeys", []), item.get("optionValues", [])):
+            for value in values if isinstance(values, list) else [values]:
+                if value:
+                    lines.append(f"- option: {value} for {key}")
+        return lines
+
+    async def _get_structured_turn_analysis(self, agent_message: str, user_message: str, current_state: str) -> Optional[Dict]:
+        """
+        Classify the turn with one JSON call covering needs-response, conversation ending,
+        answered questions, item completion and next state. Returns None if the output doesn't validate.
+        """
+        questions = self.conversation_context["pending_questions"].copy()
+        try:
+            user_prompt = self._fit_prompt(
+                "turn_analysis",
+                lambda fields: build_turn_analysis_prompt(fields, user_message, agent_message, questions, current_state),
+                other_prompt=TURN_ANALYSIS_PROMPT
+            )
+            content = await self._chat_completion(
+                "turn_analysis",
+                messages=[
+                    {"role": "system", "content": TURN_ANALYSIS_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0,
+                max_tokens=150
+            )
+            result = parse_turn_analysis(content, len(questions))
+        except Exception as e:
+            self.logger.error("Error in structured turn analysis: %s", e, exc_info=True)
+            return None
+
+        if result is None:
+            self.logger.warning("Structured turn analysis did not match schema: %s", content)
+            return None
+
+        for i in result.answered_questions:
+            if questions[i] in self.conversation_context["pending_questions"]:
+                self.conversation_context["pending_questions"].remove(questions[i])
+                self.logger.debug("Removed answered question: %s", questions[i])
+
+        # Same guard as _is_item_completed: nothing being built means nothing completed
+        has_item = self.conversation_context["current_item"] and self.conversation_context["items_in_progress"]
+        return {
+            "needs_response": result.needs_response,
+            "conversation_ending": result.conversation_ending,
+            "item_completed": bool(has_item) and result.item_completed,
+            "next_state": result.next_state
+        }
+
+    async def _update_conversation_context(self, agent_message: str, user_message: str, current_state: str) -> Dict:
+        """Update conversation context based on agent's response and return the turn analysis"""
+        self.logger.debug("Updating context with agent message: %s", agent_message)
         
         # Update chat history
         self.conversation_context["chat_history"].extend([
@@ -246,14 +674,17 @@ class ConversationOrchestrator:
         ])
         
         self.conversation_context["last_agent_message"] = agent_message
-        self._track_item_construction(agent_message, user_message)
+        analysis = await self._analyze_turn(agent_message, user_message, current_state)
         current_item = self.conversation_context["current_item"]
 
-        if self._needs_response(agent_message):
+        if analysis["needs_response"]:
             self.conversation_context["pending_questions"].append(agent_message)
             self.logger.debug("Added pending question")
 
-        complete = self._is_item_completed(agent_message, current_item, self.conversation_context["items_in_progress"])
+        if "item_completed" in analysis:
+            complete = analysis["item_completed"]
+        else:
+            complete = await self._is_item_completed(agent_message, current_item, self.conversation_context["items_in_progress"])
         if complete and not self.conversation_context["pending_questions"]: #and no pending question i think
             # Handle completed item
             self.conversation_context["ordered_items"].append(current_item)
@@ -275,7 +706,7 @@ class ConversationOrchestrator:
             # Set new current_item if there are more items to order
             if self.conversation_context["order_goal"]:
                 self.conversation_context["current_item"] = self.conversation_context["order_goal"][0]
-                self.logger.debug(f"Updated current item to: {self.conversation_context['current_item']}")
+                self.logger.debug("Updated current item to: %s", self.conversation_context['current_item'])
 
         # # check if the item is complete, if so, then don't update just yet, do the item is complete stuff by setting a flag to skip over
         # #  if not, we need to update item with data and then check again becasue it might've just been completed
@@ -319,9 +750,10 @@ class ConversationOrchestrator:
         #     if not completed_before_update:
         #         self._track_item_construction(agent_message, user_message)
         
-        self.logger.debug(f"New Context: {self.conversation_context}")
+        self.logger.debug("New Context: %s", self.conversation_context)
+        return analysis
 
-    def _is_item_completed(self, agent_message: str, goal_item: Optional[Dict], current_item: Optional[Dict]) -> bool:
+    async def _is_item_completed(self, agent_message: str, goal_item: Optional[Dict], current_item: Optional[Dict]) -> bool:
         if not goal_item or not current_item:
             self.logger.debug("Item Completed Check: missing current_item")
             return False
@@ -331,24 +763,24 @@ class ConversationOrchestrator:
             Given the intended order and the current item, confirm if the two are the same more or less (formatting can be different)
 
             Examples that shoudl return true:
-            intended_item: {'itemName': 'Plain Classic Hot Dog', 'optionKeys': ['customizations', 'meal option', 'side options', 'drink options'], 'optionValues': [['no mayo'], ['meal'], ['chili cheese fries'], ['rootbeer float']]}
-            current_item: ['- new_item: Plain Classic Hot Dog', '- option: no mayo for sauce', '- meal_type: meal', '- option: chili cheese fries for side', '- option: rootbeer float for drink']
+            intended_item: Plain Classic Hot Dog (customizations: no mayo; meal: meal; side: chili cheese fries; drink: rootbeer float)
+            current_item: new_item: Plain Classic Hot Dog; option: no mayo for sauce; meal_type: meal; option: chili cheese fries for side; option: rootbeer float for drink
 
             Examples that should return false:
-            intended_item: {'itemName': 'Plain Classic Hot Dog', 'optionKeys': ['customizations', 'meal option', 'side options', 'drink options'], 'optionValues': [['no mayo', 'add sauerkraut', 'easy mustard'], ['meal'], ['chili cheese fries'], ['rootbeer float']]}
-            current_item: ['- new_item: Plain Classic Hot Dog', '- option: no mayo for sauce', '- option: sauerkraut for topping', '- option: light mustard for sauce', '- meal_type: meal']
+            intended_item: Plain Classic Hot Dog (customizations: no mayo, add sauerkraut, easy mustard; meal: meal; side: chili cheese fries; drink: rootbeer float)
+            current_item: new_item: Plain Classic Hot Dog; option: no mayo for sauce; option: sauerkraut for topping; option: light mustard for sauce; meal_type: meal
 
             The names of the specific items should be the same. The structure and ordering doesn't matter. But all the actual items should be there.
             """
             
             user_prompt = f"""
-            Intended order: {goal_item}
-            Current item: {current_item}
+            Intended order: {encode_item(goal_item)}
+            Current item: {encode_build(current_item)}
             Does this confirm the item was successfully ordered? Return only "true" or "false".
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "is_item_completed",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -357,30 +789,34 @@ class ConversationOrchestrator:
                 max_tokens=10
             )
             
-            result = response.choices[0].message.content.strip().lower()
-            self.logger.info(f"Is Item Completed result: {result}")
+            result = content.strip().lower()
+            self.logger.info("Is Item Completed result: %s", result)
             return result == "true"
             
         except Exception as e:
-            self.logger.error(f"Error in GPT is item completed check: {e}", exc_info=True)
-            self.logger.error(f"Failed message: '{agent_message}'")
+            self.logger.error("Error in GPT is item completed check: %s", e, exc_info=True)
+            self.logger.error("Failed message: '%s'", agent_message)
             # Default to False on error to avoid accidentally removing items
             return False
 
-    def _get_next_state(self, current_state: str) -> str:
-        """Determine next state based on context and GPT-4 analysis"""
+    async def _get_next_state(self, current_state: str, analysis: Dict) -> str:
+        """Determine next state based on context, this turn's analysis and GPT-4"""
         try:
-            # First, use GPT to analyze if this is a conversation ending
-            if self._is_conversation_ending(self.conversation_context["last_agent_message"]):
+            # First, check if the turn analysis found a conversation ending
+            if analysis["conversation_ending"]:
                 return "DONE"
             
             # Always check if we need to answer a question
-            if self._needs_response(self.conversation_context["last_agent_message"]):
+            if analysis["needs_response"]:
                 return "CLARIFY"
             
             # If we're in DONE state and no questions to answer, stay in DONE
             if current_state == "DONE":
                 return "DONE"
+
+            # The structured turn analysis already picked the next state
+            if "next_state" in analysis:
+                return analysis["next_state"]
             
             # Use GPT-4 to determine the next most appropriate state
             system_prompt = """
@@ -397,19 +833,19 @@ class ConversationOrchestrator:
             Respond with only one word: the next state.
             """
             
-            context_prompt = f"""
+            context_prompt = self._fit_prompt("get_next_state", lambda fields: f"""
             Current state: {current_state}
-            Remaining items to order: {self.conversation_context['order_goal']}
-            Current item: {self.conversation_context['current_item']}
-            Ordered items: {self.conversation_context['ordered_items']}
-            Pending questions: {self.conversation_context['pending_questions']}
-            Last staff message: {self.conversation_context['last_agent_message']}
+            Remaining items to order: {fields['order_goal']}
+            Current item: {fields['current_item']}
+            Ordered items: {fields['ordered_items']}
+            Pending questions: {fields['pending_questions']}
+            Last staff message: {fields['last_agent_message']}
             
             What should be the next conversation state?
-            """
+            """, other_prompt=system_prompt)
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "get_next_state",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": context_prompt}
@@ -418,18 +854,18 @@ class ConversationOrchestrator:
                 max_tokens=10
             )
             
-            next_state = response.choices[0].message.content.strip().upper()
-            self.logger.debug(f"GPT suggested next state: {next_state}")
+            next_state = content.strip().upper()
+            self.logger.debug("GPT suggested next state: %s", next_state)
             
             # Validate the state is valid, default to DONE if not
             valid_states = {"GREET", "QUESTION", "ORDER", "CLARIFY", "PRE-DONE", "DONE"}
             return next_state if next_state in valid_states else "DONE"
             
         except Exception as e:
-            self.logger.error(f"Error in get_next_state: {e}", exc_info=True)
+            self.logger.error("Error in get_next_state: %s", e, exc_info=True)
             return "DONE"  # Default to DONE on error
 
-    def _is_conversation_ending(self, agent_message: str) -> bool:
+    async def _is_conversation_ending(self, agent_message: str) -> bool:
         """Use GPT to determine if the message indicates the conversation should end"""
         try:
             system_prompt = """
@@ -449,8 +885,8 @@ class ConversationOrchestrator:
             - "The burger costs $10.99"
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "is_conversation_ending",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Message: {agent_message}\nDoes this message indicate the conversation should end?"}
@@ -459,45 +895,236 @@ class ConversationOrchestrator:
                 max_tokens=10
             )
             
-            result = response.choices[0].message.content.strip().lower()
-            self.logger.debug(f"GPT conversation ending analysis: {result}")
+            result = content.strip().lower()
+            self.logger.debug("GPT conversation ending analysis: %s", result)
             return result == "true"
             
         except Exception as e:
-            self.logger.error(f"Error in GPT conversation ending check: {e}", exc_info=True)
+            self.logger.error("Error in GPT conversation ending check: %s", e, exc_info=True)
             # Default to False on error to avoid prematurely ending conversations
             return False
 
     def _pick_random_style(self) -> Dict[str, str]:
         """Generate a random conversation style once at the start"""
         return {
-            "emotion": random.choice(self.EMOTIONS),
-            "tone": random.choice(self.TONES),
-            "brevity": random.choice(self.BREVITIES)
+            "emotion": self.rng.choice(self.EMOTIONS),
+            "tone": self.rng.choice(self.TONES),
+            "brevity": self.rng.choice(self.BREVITIES)
         }
 
-    def _get_gpt4_response(self, system_prompt: str, user_prompt: str) -> str:
+    async def _chat_completion(self, call_site: str, messages: List[Dict], **params) -> str:
+        """
+        Send a chat completion on the call site's routed model and return the message text.
+        Deterministic (temperature=0) calls are served from the response cache when one is configured.
+        With a cassette, completions are recorded, or replayed instead of sent.
+        """
+        messages = self._compact_messages(call_site, messages)
+        model = self.routes.route(call_site).model
+        if self.cassette is not None:
+            request = {"call_site": call_site, "model": model, "messages": messages, "params": params}
+            if self.cassette.replaying:
+                self.usage["replayed_calls"] += 1
+                return self._play("openai", request)["content"]
+
+        content = None
+        cacheable = self.response_cache is not None and params.get("temperature") == 0
+        if cacheable:
+            key = self.response_cache.make_key(model, messages, **params)
+            content = await self.response_cache.aget(key)
+            if content is not None:
+                self.usage["cache_hits"] += 1
+                get_metrics().increment(f"openai.{call_site}", "cache_hits")
+                self.logger.debug("Response cache hit for %s", call_site)
+
+        if content is None:
+            model, response = await self._scheduled_completion(call_site, messages, **params)
+            content = response.choices[0].message.content
+            if cacheable and content is not None:
+                # Keyed by the model that answered, so a fallback's answer is never served as the routed model's
+                await self.response_cache.aset(self.response_cache.make_key(model, messages, **params), content)
+
+        if self.cassette is not None:
+            self.cassette.record("openai", request, {"content": content, "model": model})
+        return content
+
+    def _play(self, kind: str, request: Dict) -> Dict:
         try:
-            self.logger.debug("Sending request to GPT-4")
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                # max_tokens=50,
-                presence_penalty=-0.1,
-                frequency_penalty=0.1
-            )
-            return response.choices[0].message.content
+            return self.cassette.play(kind, request)
+        except CassetteMiss as e:
+            self._replay_error = e
+            raise
+
+    async def _scheduled_completion(self, call_site: str, messages: List[Dict], **params):
+        """
+        Send a completion through the process-wide scheduler, retrying 429s, 5xx and connection
+        errors with backoff so rate limiting doesn't turn into the callers' silent fallbacks.
+        If the routed model still fails, the route's fallback models are tried in turn.
+        Returns the model that answered and its response.
+        """
+        scheduler = get_scheduler()
+        priority = self.CALL_PRIORITIES.get(call_site, 3)
+        route = self.routes.route(call_site)
+        start = time.monotonic()
+        for model in route.models:
+            try:
+                for attempt in range(self.MAX_API_RETRIES + 1):
+                    try:
+                        async with scheduler.slot("openai", priority, self._estimate_tokens(params, messages)) as slot:
+                            if call_site == "customer_message_draft":
+                                self._draft_started = True
+                            response = await self.openai_client.chat.completions.create(
+                                model=model, messages=messages, **self._request_options(route), **params
+                            )
+                            self._record_usage(call_site, slot, start, model, response.usage)
+                            return model, response
+                    except Exception as e:
+                        await self._backoff_or_raise(call_site, e, attempt, start)
+            except Exception as e:
+                self._fall_back_or_raise(call_site, route.models, model, e)
+
+    async def _stream_completion(self, call_site: str, messages: List[Dict], **params):
+        """
+        Stream a completion through the scheduler, yielding text as it arrives. Failures are
+        retried, then sent to the fallback models, only before the first token; with a cassette
+        the text is recorded or replayed.
+        """
+        messages = self._compact_messages(call_site, messages)
+        route = self.routes.route(call_site)
+        request = {"call_site": call_site, "model": route.model, "messages": messages, "params": params}
+        if self.cassette is not None and self.cassette.replaying:
+            self.usage["replayed_calls"] += 1
+            yield self._play("openai", request)["content"]
+            return
+
+        scheduler = get_scheduler()
+        priority = self.CALL_PRIORITIES.get(call_site, 3)
+        start = time.monotonic()
+        parts = []
+        for model in route.models:
+            try:
+                for attempt in range(self.MAX_API_RETRIES + 1):
+                    try:
+                        async with scheduler.slot("openai", priority, self._estimate_tokens(params, messages)) as slot:
+                            stream = await self.openai_client.chat.completions.create(
+                                model=model, messages=messages, stream=True,
+                                stream_options={"include_usage": True}, **self._request_options(route), **params
+                            )
+                            usage = None
+                            async for chunk in stream:
+                                usage = getattr(chunk, "usage", None) or usage
+                                delta = chunk.choices[0].delta.content if chunk.choices else None
+                                if delta:
+                                    parts.append(delta)
+                                    yield delta
+                            self._record_usage(call_site, slot, start, model, usage)
+                        break
+                    except Exception as e:
+                        if parts:
+                            get_metrics().record_call(f"openai.{call_site}", time.monotonic() - start, error=True)
+                            raise
+                        await self._backoff_or_raise(call_site, e, attempt, start)
+                break
+            except Exception as e:
+                if parts:
+                    raise
+                self._fall_back_or_raise(call_site, route.models, model, e)
+
+        if self.cassette is not None:
+            self.cassette.record("openai", request, {"content": "".join(parts), "model": model})
+
+    @staticmethod
+    def _estimate_tokens(params: Dict, messages: List[Dict]) -> int:
+        """Rough token estimate for the budget, corrected with the real usage afterwards."""
+        return sum(estimate_tokens(m["content"]) for m in messages) + params.get("max_tokens", 256)
+
+    @staticmethod
+    def _request_options(route) -> Dict:
+        # A route without a timeout keeps the client's default rather than waiting forever
+        return {"timeout": route.timeout} if route.timeout else {}
+
+    def _fit_prompt(self, call_site: str, render, context: Optional[Dict] = None, other_prompt: str = "") -> str:
+        """
+        Render a prompt from the compactly encoded conversation context, trimming the least
+        important fields until it and the call's other prompt fit the call site's token budget.
+        """
+        budget = PROMPT_TOKEN_BUDGETS.get(call_site, DEFAULT_PROMPT_BUDGET) - estimate_tokens(compact_text(other_prompt))
+        prompt, trimmed = fit_to_budget(lambda fields: compact_text(render(fields)),
+                                        context or self.conversation_context, budget)
+        if trimmed:
+            get_metrics().increment(f"openai.{call_site}", "budget_trims")
+            self.logger.info("Trimmed %s to fit the %s prompt in its token budget", ", ".join(trimmed), call_site)
+        return prompt
+
+    def _compact_messages(self, call_site: str, messages: List[Dict]) -> List[Dict]:
+        """Strip prompt indentation and log the prompt's estimated size against its call site's budget."""
+        messages = [{**m, "content": compact_text(m["content"])} for m in messages]
+        tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        budget = PROMPT_TOKEN_BUDGETS.get(call_site, DEFAULT_PROMPT_BUDGET)
+        site = f"openai.{call_site}"
+        get_metrics().increment(site, "estimated_prompt_tokens", tokens)
+        if tokens > budget:
+            get_metrics().increment(site, "over_budget")
+            self.logger.warning("Prompt for %s is ~%d tokens, over its budget of %d", call_site, tokens, budget)
+        else:
+            self.logger.debug("Prompt for %s is ~%d tokens (budget %d)", call_site, tokens, budget)
+        return messages
+
+    def _record_usage(self, call_site: str, slot, start: float, model: Optional[str], usage):
+        self.usage["calls"] += 1
+        if usage is not None:
+            slot.set_tokens(usage.total_tokens)
+            self.usage["prompt_tokens"] += usage.prompt_tokens
+            self.usage["completion_tokens"] += usage.completion_tokens
+        # Latency includes scheduler queueing and retries: the time the caller waited
+        get_metrics().record_call(f"openai.{call_site}", time.monotonic() - start, model=model,
+                                  prompt_tokens=usage.prompt_tokens if usage else 0,
+                                  completion_tokens=usage.completion_tokens if usage else 0)
+
+    async def _backoff_or_raise(self, call_site: str, e: Exception, attempt: int, start: float):
+        """Sleep before the next attempt if e is retryable, otherwise record the failure and re-raise."""
+        site = f"openai.{call_site}"
+        if not is_retryable(e) or attempt == self.MAX_API_RETRIES:
+            get_metrics().record_call(site, time.monotonic() - start, error=True)
+            raise e
+        get_metrics().increment(site, "retries")
+        delay = retry_delay(attempt)
+        self.logger.warning("OpenAI call %s failed (%s), retrying in %.1fs", call_site, status_of(e) or type(e).__name__, delay)
+        await asyncio.sleep(delay)
+
+    def _fall_back_or_raise(self, call_site: str, models: List[str], model: str, e: Exception):
+        """Once model has failed for good, move on to the next model in the route, or re-raise after the last."""
+        if model == models[-1]:
+            raise e
+        get_metrics().increment(f"openai.{call_site}", "fallbacks")
+        self.logger.warning("OpenAI call %s failed on %s (%s), falling back to %s", call_site, model,
+                            status_of(e) or type(e).__name__, models[models.index(model) + 1])
+
+    async def _customer_completion(self, system_prompt: str, user_prompt: str,
+                                   call_site: str = "customer_message") -> str:
+        """The customer message completion itself; errors propagate."""
+        self.logger.debug("Sending %s request", call_site)
+        return await self._chat_completion(
+            call_site,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.7,
+            # max_tokens=50,
+            presence_penalty=-0.1,
+            frequency_penalty=0.1
+        )
+
+    async def _get_gpt4_response(self, system_prompt: str, user_prompt: str, call_site: str = "customer_message") -> str:
+        try:
+            return await self._customer_completion(system_prompt, user_prompt, call_site)
         except Exception as e:
-            self.logger.error(f"Error getting GPT-4 response: {e}", exc_info=True)
+            self.logger.error("Error getting GPT-4 response: %s", e, exc_info=True)
             if "order" in user_prompt.lower():
                 return "`I'd like `to order that, please."
             return "Yes, please."
 
-    def _needs_response(self, agent_message: str) -> bool:
+    async def _needs_response(self, agent_message: str) -> bool:
         """
         Use GPT-4 to determine if the agent's message requires a customer response
         and what type of response is appropriate.
@@ -526,8 +1153,8 @@ class ConversationOrchestrator:
             - "Got it, one burger coming up"
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "needs_response",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Message: {agent_message}\nDoes this message require a direct response about the order?"}
@@ -536,16 +1163,16 @@ class ConversationOrchestrator:
                 max_tokens=10
             )
             
-            result = response.choices[0].message.content.strip().lower() == "true"
-            self.logger.debug(f"GPT response analysis: {result}")
+            result = content.strip().lower() == "true"
+            self.logger.debug("GPT response analysis: %s", result)
             return result
             
         except Exception as e:
-            self.logger.error(f"Error in GPT response check: {e}", exc_info=True)
+            self.logger.error("Error in GPT response check: %s", e, exc_info=True)
             # Fall back to simple question mark check if GPT fails
             return "?" in agent_message
 
-    def _is_question_answered(self, question: str, customer_response: str) -> bool:
+    async def _is_question_answered(self, question: str, customer_response: str) -> bool:
         """
         Check if a question was adequately answered and remove it from pending_questions if so.
         Returns True if the question was answered.
@@ -571,8 +1198,8 @@ class ConversationOrchestrator:
             Response: "What's your hours?" -> false
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "is_question_answered",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Question: {question}\nResponse: {customer_response}\nWas the question adequately answered?"}
@@ -581,24 +1208,46 @@ class ConversationOrchestrator:
                 max_tokens=10
             )
             
-            result = response.choices[0].message.content.strip().lower() == "true"
-            self.logger.debug(f"GPT question-answer analysis: {result}")
+            result = content.strip().lower() == "true"
+            self.logger.debug("GPT question-answer analysis: %s", result)
             
             # If the question was answered, remove it from pending_questions using remove()
             if result and question in self.conversation_context["pending_questions"]:
                 self.conversation_context["pending_questions"].remove(question)
-                self.logger.debug(f"Removed answered question: {question}")
+                self.logger.debug("Removed answered question: %s", question)
             
             return result
             
         except Exception as e:
-            self.logger.error(f"Error in GPT question-answer check: {e}", exc_info=True)
+            self.logger.error("Error in GPT question-answer check: %s", e, exc_info=True)
             return False
         
-    def _track_item_construction(self, agent_message: str, user_message: str):
+    def _recent_context(self) -> str:
+        """
+        The exchanges before the latest one, newest first into a fixed character budget.
+        Older context is already folded into the running item build.
+        """
+        # chat_history already ends with the latest exchange
+        earlier = self.conversation_context["chat_history"][:-2]
+        window = earlier[-2 * self.TRACKING_CONTEXT_EXCHANGES:]
+        lines = []
+        budget = self.TRACKING_CONTEXT_CHARS
+        for msg in reversed(window):
+            line = f"{'Customer' if msg['role'] == 'user' else 'Staff'}: {msg['content']}"
+            if len(line) > budget:
+                line = line[:max(budget - 3, 0)] + "..."
+            lines.append(line)
+            budget -= len(line)
+            if budget <= 0:
+                break
+        if len(earlier) > len(lines):
+            lines.append("(earlier messages are summarized in LATEST ITEM BUILD)")
+        return "\n".join(reversed(lines)) or "none"
+
+    async def _track_item_construction(self, agent_message: str, user_message: str):
         """
-        Track what's being constructed based on the entire conversation context.
-        Uses chat history to understand if items are part of a meal or standalone.
+        Track what's being constructed incrementally: the latest exchange is applied to the running
+        item build, with a bounded window of earlier messages to tell meals from standalone items.
         """
         try:
             system_prompt = """
@@ -643,27 +1292,24 @@ class ConversationOrchestrator:
                 Analyze the latest agent and user messages in the context of the conversation to see how best to modify the existing items list.
                 """
             
-            # Format the entire chat history
-            chat_context = "\n".join([
-                f"{'Customer' if msg['role'] == 'user' else 'Staff'}: {msg['content']}"
-                for msg in self.conversation_context["chat_history"]
-            ])
+            item_build = "\n".join(self.conversation_context["items_in_progress"]) or "none"
             
             user_prompt = f"""
-            FULL CONVERSATION:
-            {chat_context}
+            RECENT CONVERSATION:
+            {self._recent_context()}
             
             LATEST EXCHANGE:
             Customer: {user_message}
             Staff: {agent_message}
 
-            LATEST ITEM BUILD: {self.conversation_context["items_in_progress"]} 
+            LATEST ITEM BUILD:
+            {item_build}
             
             Return the updated items list.
             """
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content = await self._chat_completion(
+                "track_item_construction",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -672,11 +1318,11 @@ class ConversationOrchestrator:
                 max_tokens=150
             )
             
-            results = response.choices[0].message.content.strip().split('\n')
+            results = content.strip().split('\n')
 
             self.conversation_context["items_in_progress"] = results
-            self.logger.debug(f"CALLED NEW BUILD LIST: {self.conversation_context['items_in_progress']}")
+            self.logger.debug("CALLED NEW BUILD LIST: %s", self.conversation_context['items_in_progress'])
 
         except Exception as e:
-            self.logger.error(f"Error tracking item construction: {e}", exc_info=True)
+            self.logger.error("Error tracking item construction: %s", e, exc_info=True)
         
\ No newline at end of file
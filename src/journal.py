@@ -0,0 +1,119 @@
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+DEFAULT_LEASE_SECONDS = 30 * 60  # longer than any simulation should take
+
+def _worker_alive(worker: str) -> bool:
+    """A worker on this host is alive if its pid is; other hosts' workers are trusted until their lease ends."""
+    host, _, pid = worker.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SimulationJournal:
+    """
+    Append-only write-ahead journal of a batch: when each simulation starts (with its seed and
+    a lease), the goal and order_id it got, and whether it finished. Appends are fsynced and
+    every claim happens under an exclusive flock, so several processes can resume one batch
+    and each unfinished simulation is run by only one of them. A simulation whose lease expired
+    without a 'done' entry (the worker hung), or whose worker process on this host is gone,
+    can be claimed again. Methods block on the lock and disk, so async code calls them through
+    asyncio.to_thread; a thread lock serializes them within the process, where flock doesn't.
+    """
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, worker: Optional[str] = None):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.state = {}  # simulation id -> merged entries
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        with self._locked():
+            # Terminate a line left partial by a crash so the next entry starts cleanly
+            size = os.fstat(self._fd).st_size
+            if size and os.pread(self._fd, 1, size - 1) != b"\n":
+                os.write(self._fd, b"\n")
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Fold in entries appended since the last read, including other processes' entries."""
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Stop at the last complete line; a line cut short by a crash fails to parse and is skipped
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.state.setdefault(entry["sim"], {}).update(entry)
+        self._offset += end
+
+    def _append(self, entry: Dict):
+        entry["ts"] = time.time()
+        os.write(self._fd, (json.dumps(entry, default=str) + "\n").encode("utf-8"))
+        os.fsync(self._fd)
+        self.state.setdefault(entry["sim"], {}).update(entry)
+
+    def entries(self) -> Dict[int, Dict]:
+        with self._locked():
+            return {sim: dict(entry) for sim, entry in self.state.items()}
+
+    def claim(self, sim: int, seed: int) -> Optional[int]:
+        """
+        Start simulation sim unless it is done or leased by a live worker.
+        Returns the seed to run it with (the recorded one when resuming), or None to skip it.
+        """
+        with self._locked():
+            entry = self.state.get(sim, {})
+            if entry.get("status") == "done":
+                return None
+            if entry.get("status") == "running" and entry.get("worker") != self.worker \
+                    and entry.get("lease_until", 0) > time.time() and _worker_alive(entry["worker"]):
+                return None
+            seed = entry.get("seed", seed)
+            self._append({"sim": sim, "status": "running", "seed": seed, "worker": self.worker,
+                          "lease_until": time.time() + self.lease_seconds})
+            return seed
+
+    def record(self, sim: int, **fields):
+        """Record progress such as the goal or order_id of a running simulation."""
+        with self._locked():
+            self._append({"sim": sim, **fields})
+
+    def finish(self, sim: int, success: bool):
+        with self._locked():
+            self._append({"sim": sim, "status": "done", "success": success, "worker": self.worker})
+
+    def release(self, sim: int, error: str):
+        """Give up a simulation that failed so a later resume retries it."""
+        with self._locked():
+            self._append({"sim": sim, "status": "failed", "error": error, "lease_until": 0})
+
+    def close(self):
+        os.close(self._fd)
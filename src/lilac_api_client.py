@@ -1,71 +1,141 @@
-import requests
-from constants import API_BASE_URL, API_TOKEN
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import asyncio
+import threading
 import time
+import weakref
+import httpx
+from metrics import get_metrics
+from scheduler import get_scheduler
+from constants import API_BASE_URL, API_TOKEN
+
+DEFAULT_POOL_SIZE = 10
+KEEPALIVE_EXPIRY = 30.0
+
+# One connection pool per event loop in the process, shared by every LilacApiClient on that loop
+_shared_clients = weakref.WeakKeyDictionary()
+_shared_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+
+def configure_pool(max_connections: int):
+    """Set the size of shared pools created after this call; tie it to the number of concurrent workers."""
+    global _pool_size
+    _pool_size = max(1, max_connections)
+
+def get_shared_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _shared_lock:
+        client = _shared_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                # All retries happen in LilacApiClient._request, which knows which requests are safe to resend
+                transport=httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=_pool_size,
+                        max_keepalive_connections=_pool_size,
+                        keepalive_expiry=KEEPALIVE_EXPIRY
+                    )
+                ),
+                timeout=LilacApiClient.REQUEST_TIMEOUT,
+            )
+            _shared_clients[loop] = client
+        return client
+
+async def close_shared_http_client():
+    """Close the shared pool for the running event loop, e.g. at the end of a batch."""
+    with _shared_lock:
+        client = _shared_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
 
 class LilacApiClient:
-    """Makes API calls to Lilac's API."""
-    def __init__(self, location="ben-franks"):
+    """Makes async API calls to Lilac's API over the process-wide connection pool."""
+    MAX_RETRIES = 3  # number of retries
+    BACKOFF_FACTOR = 1  # wait 1, 2, 4 seconds between retries
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    # A POST that got a 5xx or timed out may have been applied; resending it would repeat the
+    # utterance or open a second order, so only statuses that mean it was refused are retried
+    POST_RETRY_STATUSES = {429, 503}
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+    REQUEST_TIMEOUT = 60.0
+
+    def __init__(self, location="ben-franks", base_url=None, http_client=None):
         self.api_token = API_TOKEN
-        self.base_url = API_BASE_URL
+        self.base_url = base_url or API_BASE_URL
         self.location = location
+        self.headers = {
+            "x-api-key": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+        }
+        # A client passed in is owned by the caller; otherwise the shared pool is used
+        self._http_client = http_client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._http_client or get_shared_http_client()
 
-        # Configure retry strategy
-        retry_strategy = Retry(
-            total=3,  # number of retries
-            backoff_factor=1,  # wait 1, 2, 4 seconds between retries
-            status_forcelist=[500, 502, 503, 504]
-        )
-        
-        # Create session with retry strategy
-        self.session = requests.Session()
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("https://", adapter)
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Nothing to release per client; the shared pool is closed with close_shared_http_client()."""
+
+    async def _request(self, call_site, method, url, **kwargs):
+        """
+        Send a request through the process-wide scheduler, retrying with exponential backoff.
+        Idempotent requests are retried on any transport error, 429 and 5xx; POSTs only when they
+        can't have reached Lilac (connection failures) or were refused (429, 503).
+        Latency and retries are recorded per endpoint.
+        """
+        scheduler = get_scheduler()
+        metrics = get_metrics()
+        site = f"lilac.{call_site}"
+        idempotent = method in self.IDEMPOTENT_METHODS
+        retry_statuses = self.RETRY_STATUSES if idempotent else self.POST_RETRY_STATUSES
+        start = time.monotonic()
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                async with scheduler.slot("lilac") as slot:
+                    resp = await self.client.request(method, url, headers=self.headers, **kwargs)
+                    slot.throttled = resp.status_code == 429
+                if resp.status_code in retry_statuses and attempt < self.MAX_RETRIES:
+                    metrics.increment(site, "retries")
+                    await asyncio.sleep(self.BACKOFF_FACTOR * 2 ** attempt)
+                    continue
+                resp.raise_for_status()
+                metrics.record_call(site, time.monotonic() - start)
+                return resp.json()
+            except httpx.TransportError as e:
+                sent = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt == self.MAX_RETRIES or (sent and not idempotent):
+                    metrics.record_call(site, time.monotonic() - start, error=True)
+                    raise
+                metrics.increment(site, "retries")
+                await asyncio.sleep(self.BACKOFF_FACTOR * 2 ** attempt)
+            except httpx.HTTPStatusError:
+                metrics.record_call(site, time.monotonic() - start, error=True)
+                raise
 
-    def start_order(self):
+    async def start_order(self):
         """Start a new order session."""
         url = f"{self.base_url}/start"
-        headers = {
-            "x-api-key": f"Bearer {self.api_token}",
-            "Content-Type": "application/json",
-        }
         data = {"location": self.location}
-        resp = requests.post(url, json=data, headers=headers)
-        resp.raise_for_status()
-        return resp.json()["orderId"]
+        resp = await self._request("start_order", "POST", url, json=data)
+        return resp["orderId"]
 
-    def send_chat_message(self, order_id, message):
+    async def send_chat_message(self, order_id, message):
         """Send a chat message to Lilac's order-taking agent."""
         url = f"{self.base_url}/chat"
-        headers = {
-            "x-api-key": f"Bearer {self.api_token}",
-            "Content-Type": "application/json",
-        }
         data = {
             "orderId": order_id,
             "input": message,
             "location": self.location
         }
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                resp = self.session.post(url, json=data, headers=headers)
-                resp.raise_for_status()
-                return resp.json()
-            except requests.exceptions.ConnectionError as e:
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(2 ** attempt)  # exponential backoff
+        return await self._request("send_chat_message", "POST", url, json=data)
 
-    def retrieve_order(self, order_id):
+    async def retrieve_order(self, order_id):
         """Retrieve the current order state."""
         url = f"{self.base_url}/order/{order_id}"
-        headers = {
-            "x-api-key": f"Bearer {self.api_token}",
-            "Content-Type": "application/json",
-        }
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        return resp.json()
+        return await self._request("retrieve_order", "GET", url)
@@ -0,0 +1,89 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - [sim=%(simulation_id)s order=%(order_id)s turn=%(turn)s] %(message)s'
+LOG_LEVEL = os.getenv('LILAC_LOG_LEVEL', 'DEBUG')
+CONTEXT_FIELDS = ("simulation_id", "order_id", "turn")
+
+# Per-task fields stamped on every record; asyncio tasks each get their own copy
+_log_context = contextvars.ContextVar("log_context", default={})
+
+_lock = threading.RLock()
+_queue_handler = None
+_listener = None
+_log_file = None
+
+class ContextFilter(logging.Filter):
+    """Copy the current simulation's context fields onto the record before it leaves the worker."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field, "-"))
+        return True
+
+def set_log_context(**fields):
+    """Set context fields (simulation_id, order_id, turn) for the current task or thread."""
+    _log_context.set({**_log_context.get(), **fields})
+
+@contextmanager
+def log_context(**fields):
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def configure_logging(log_dir: str = "logs", run_name: Optional[str] = None, level=None) -> str:
+    """
+    Route orchestrator logs for this run to log_dir/{run_name}.log through one queue and one
+    background writer thread. Calling it again starts a new run file; returns the file path.
+    """
+    global _queue_handler, _listener, _log_file
+    os.makedirs(log_dir, exist_ok=True)
+    run_name = run_name or f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    log_file = os.path.join(log_dir, f"{run_name}.log")
+
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    with _lock:
+        logger = logging.getLogger("conversation_orchestrator")
+        logger.setLevel(level or LOG_LEVEL)
+        if _queue_handler is None:
+            _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+            _queue_handler.addFilter(ContextFilter())
+            logger.addHandler(_queue_handler)
+            atexit.register(shutdown_logging)
+        if _listener is not None:
+            _listener.stop()  # drains what the previous run queued
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        _log_file = log_file
+    return log_file
+
+def ensure_logging() -> str:
+    """Configure the default per-run file on first use; later calls reuse it."""
+    with _lock:
+        if _listener is None:
+            return configure_logging()
+        return _log_file
+
+def shutdown_logging():
+    """Flush queued records and close the run file."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
@@ -1,42 +1,103 @@
-from lilac_api_client import LilacApiClient
+from lilac_api_client import LilacApiClient, configure_pool, close_shared_http_client
 from order_goal_generator import OrderGoalGenerator
-from conversation_orchestrator import ConversationOrchestrator
-import threading
+from conversation_orchestrator import ConversationOrchestrator, close_shared_openai_client
+from cassette import Cassette, CassetteLilacClient
+from order_matching import diff_orders
+from results_sink import ResultsSink
+from journal import SimulationJournal
+from log_pipeline import configure_logging, set_log_context, shutdown_logging
+from scheduler import get_scheduler
+from metrics import get_metrics
+import asyncio
+import os
+import random
 import time
-from queue import Queue
-import concurrent.futures
 import copy
 
-def run_simulation(order_complexity="simple"):
+async def run_simulation(order_complexity="simple", orchestrator_kwargs=None, cassette=None, lilac_client=None,
+                         sink=None, simulation_id=None, verbose=True, seed=None, journal=None):
     """
     Run the entire pipeline:
     1. Generate an order goal (simple, medium, or complex)
     2. Start a new order
     3. Simulate the conversation
     4. Print out final conversation logs and final order
+
+    orchestrator_kwargs are passed to ConversationOrchestrator (e.g. structured_analysis=True)
+    With a cassette, the goal and every Lilac and OpenAI response are recorded, or replayed without network.
+    Pass lilac_client to reuse one client across simulations.
+    With a sink (ResultsSink), one structured record is written per simulation; verbose=False skips the printout.
+    A seed makes the goal and the customer's style and topic choices reproducible. With a journal
+    (SimulationJournal), the goal and order_id are recorded under simulation_id as soon as they are known.
     """
+    start_time = time.time()
+    if simulation_id is not None:
+        set_log_context(simulation_id=simulation_id)
     # Step 1: Generate the order goal
-    generator = OrderGoalGenerator()
-    if order_complexity == "simple":
-        goal = generator.generate_simple_order()
-    elif order_complexity == "medium":
-        goal = generator.generate_medium_order()
+    if cassette is not None and cassette.replaying:
+        goal = cassette.play("goal", {})["goal"]
     else:
-        goal = generator.generate_complex_order()
+        generator = OrderGoalGenerator(seed)
+        if order_complexity == "simple":
+            goal = generator.generate_simple_order()
+        elif order_complexity == "medium":
+            goal = generator.generate_medium_order()
+        else:
+            goal = generator.generate_complex_order()
+        if cassette is not None:
+            cassette.record("goal", {}, {"goal": copy.deepcopy(goal)})
 
-    print(f"Running simulation with: {goal}")
+    if journal is not None:
+        await asyncio.to_thread(journal.record, simulation_id, goal=goal)
+    if verbose:
+        print(f"Running simulation with: {goal}")
     # Step 2: Start a new order
-    lilac_client = LilacApiClient()
-    order_id = lilac_client.start_order()
+    lilac_client = lilac_client or LilacApiClient()
+    if cassette is not None:
+        lilac_client = CassetteLilacClient(cassette, None if cassette.replaying else lilac_client)
+    try:
+        async with lilac_client:
+            order_id = await lilac_client.start_order()
+            if journal is not None:
+                await asyncio.to_thread(journal.record, simulation_id, order_id=order_id)
+
+            # Step 3: Simulate conversation
+            orchestrator = ConversationOrchestrator(lilac_client, cassette=cassette, seed=seed,
+                                                    **(orchestrator_kwargs or {}))
+            goal_copy = copy.deepcopy(goal)
+            conversation_start = time.time()
+            conversation_log = await orchestrator.run_conversation(order_id, goal_copy)
+            conversation_time = time.time() - conversation_start
 
-    # Step 3: Simulate conversation
-    orchestrator = ConversationOrchestrator(lilac_client)
-    goal_copy = copy.deepcopy(goal)
-    conversation_log = orchestrator.run_conversation(order_id, goal_copy)
+            # Retrieve final order
+            final_state = await lilac_client.retrieve_order(order_id)
+            final_order = final_state["order"]
+    finally:
+        if cassette is not None:
+            cassette.save()
 
-    # Retrieve final order
-    final_state = lilac_client.retrieve_order(order_id)
-    final_order = final_state["order"]
+    diff = diff_orders(goal, final_order)
+    if sink is not None:
+        await sink.awrite({
+            "simulation": simulation_id,
+            "order_id": order_id,
+            "complexity": order_complexity,
+            "seed": seed,
+            "goal": goal,
+            "transcript": conversation_log,
+            "final_order": final_order,
+            "match": diff["match"],
+            "diff": diff,
+            "timings": {
+                "total_seconds": round(time.time() - start_time, 3),
+                "conversation_seconds": round(conversation_time, 3),
+                "turns": sum(1 for msg in conversation_log if msg["role"] == "user"),
+                "per_turn": orchestrator.turn_timings
+            },
+            "usage": dict(orchestrator.usage)
+        })
+    if not verbose:
+        return diff["match"]
 
     # Step 4: Print or log results
     print("\n==========================")
@@ -60,7 +121,8 @@ def run_simulation(order_complexity="simple"):
     print(" Order Verification ")
     print("==========================\n")
     
-    orders_match = compare_orders(goal, final_order)
+    print_order_diff(diff)
+    orders_match = diff["match"]
     if orders_match:
         print("✅ Goal order matches final order exactly!")
 
@@ -75,72 +137,103 @@ def run_simulation(order_complexity="simple"):
     return orders_match
 
 def compare_orders(goal_order, final_order):
-    if len(goal_order) != len(final_order):
-        print(f"❌ Order length mismatch: Goal has {len(goal_order)} items, Final has {len(final_order)} items")
-        return False
-    
-    for i, (goal_item, final_item) in enumerate(zip(goal_order, final_order)):
-        # Compare itemName directly
-        if goal_item['itemName'] != final_item['itemName']:
-            print(f"\nDifference in item {i + 1}:")
-            print(f"❌ itemName:")
-            print(f"  Goal:  {goal_item['itemName']}")
-            print(f"  Final: {final_item['itemName']}")
-            return False
-        
-        # Filter out keys with empty values from both items
-        goal_keys_values = []
-        final_keys_values = []
-        
-        for k, v in zip(goal_item['optionKeys'], goal_item['optionValues']):
-            if v:
-                # If v is a list, sort it using custom key function
-                if isinstance(v, list):
-                    v = sorted(v, key=lambda x: x.split()[-1] if len(x.split()) > 1 else x.split()[0])
-                goal_keys_values.append((k, v))
-                
-        for k, v in zip(final_item['optionKeys'], final_item['optionValues']):
-            if v:
-                # If v is a list, sort it using custom key function
-                if isinstance(v, list):
-                    v = sorted(v, key=lambda x: x.split()[-1] if len(x.split()) > 1 else x.split()[0])
-                final_keys_values.append((k, v))
-        
-        # Sort the key-value pairs
-        goal_keys_values.sort()
-        final_keys_values.sort()
-        
-        if goal_keys_values != final_keys_values:
-            print(f"\nDifference in item {i + 1}:")
+    """
+    Check that the final order has the same items as the goal, in any sequence,
+    printing what differs. Use order_matching.score_orders to score batches silently.
+    """
+    diff = diff_orders(goal_order, final_order)
+    print_order_diff(diff)
+    return diff["match"]
+
+def print_order_diff(diff):
+    """Print the differences found by order_matching.diff_orders."""
+    if diff["goal_items"] != diff["final_items"]:
+        print(f"❌ Order length mismatch: Goal has {diff['goal_items']} items, Final has {diff['final_items']} items")
+
+    for item in diff["items"]:
+        if item["status"] == "missing":
+            print(f"❌ Missing item: {item['item']}")
+        elif item["status"] == "extra":
+            print(f"❌ Unexpected item: {item['item']}")
+        else:
+            print(f"\nDifference in {item['item']}:")
             print(f"❌ Options mismatch:")
-            print(f"  Goal:  {goal_keys_values}")
-            print(f"  Final: {final_keys_values}")
-            return False
-    
-    return True
+            for key, values in item["options"].items():
+                print(f"  {key}: missing {values['missing']}, extra {values['extra']}")
 
-def run_parallel_simulations(num_simulations=10, max_workers=5, level="simple"):
-    """Run multiple simulations in parallel using ThreadPoolExecutor"""
-    results = []
+async def run_parallel_simulations(num_simulations=10, max_workers=5, level="simple", orchestrator_kwargs=None,
+                                   cassette_dir=None, cassette_mode="record", results_path=None,
+                                   metrics_path=None, lilac_client=None, journal_path=None, resume=False,
+                                   seed=None):
+    """
+    Run multiple simulations concurrently on one event loop, with at most max_workers in flight.
+    With cassette_dir, simulation i records to (or replays from) cassette_dir/sim_{i}.jsonl.gz
+    With results_path, each simulation appends one JSONL record there instead of printing its transcript.
+    Logs for the whole run go to one file, tagged with each line's simulation, order and turn.
+    Per-call-site metrics are printed at the end, and written as JSON to metrics_path if given.
+    Pass lilac_client to use a different backend than the shared LilacApiClient.
+
+    With journal_path, every simulation's seed, goal, order_id and status is journaled as it runs.
+    After an interruption, run again with resume=True to skip finished simulations and rerun only
+    the rest with their original goals; concurrent resumes of one journal split the work.
+    """
     start_time = time.time()
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all simulations
-        future_to_sim = {
-            executor.submit(run_simulation, level): i 
-            for i in range(num_simulations)
-        }
-        
-        # Process completed simulations
-        for future in concurrent.futures.as_completed(future_to_sim):
-            sim_num = future_to_sim[future]
+    get_metrics().reset()
+    log_file = configure_logging()
+    semaphore = asyncio.Semaphore(max_workers)
+    # One keep-alive pool sized to the number of conversations in flight, shared by every simulation
+    configure_pool(max_workers)
+    lilac_client = lilac_client or LilacApiClient()
+    sink = ResultsSink(results_path) if results_path else None
+    journal = None
+    if journal_path:
+        journal = SimulationJournal(journal_path)
+        if not resume and await asyncio.to_thread(journal.entries):
+            raise ValueError(f"Journal {journal_path} already has entries; pass resume=True to continue it")
+    # Goal seeds are journaled, so a resumed simulation gets the same goal
+    base_seed = seed if seed is not None else random.randrange(2 ** 31)
+    skipped = 0
+
+    async def run_one(sim_num):
+        nonlocal skipped
+        async with semaphore:
+            sim_seed = seed + sim_num if seed is not None else None
+            if journal is not None:
+                # The journal blocks on its file lock and fsync, so it runs off the event loop
+                sim_seed = await asyncio.to_thread(journal.claim, sim_num, base_seed + sim_num)
+                if sim_seed is None:
+                    skipped += 1
+                    entries = await asyncio.to_thread(journal.entries)
+                    return bool(entries.get(sim_num, {}).get("success"))
             try:
-                success = future.result()
-                results.append(success)
+                cassette = None
+                if cassette_dir:
+                    cassette = Cassette(os.path.join(cassette_dir, f"sim_{sim_num}.jsonl.gz"), cassette_mode)
+                success = await run_simulation(level, orchestrator_kwargs, cassette, lilac_client,
+                                               sink=sink, simulation_id=sim_num, verbose=sink is None,
+                                               seed=sim_seed, journal=journal)
+                if journal is not None:
+                    await asyncio.to_thread(journal.finish, sim_num, success)
                 print(f"\nSimulation {sim_num} completed successfully: {success}")
+                return success
             except Exception as e:
                 print(f"\nSimulation {sim_num} generated an exception: {e}")
-                results.append(False)
+                if journal is not None:
+                    await asyncio.to_thread(journal.release, sim_num, repr(e))
+                if sink is not None:
+                    await sink.awrite({"simulation": sim_num, "complexity": level, "match": False, "error": repr(e)})
+                return False
+
+    try:
+        results = await asyncio.gather(*(run_one(i) for i in range(num_simulations)))
+    finally:
+        await close_shared_http_client()
+        await close_shared_openai_client()
+        if sink is not None:
+            sink.close()
+        shutdown_logging()
+        if journal is not None:
+            journal.close()
     
     end_time = time.time()
     duration = end_time - start_time
@@ -151,17 +244,41 @@ def run_parallel_simulations(num_simulations=10, max_workers=5, level="simple"):
     print(f"Total simulations: {num_simulations}")
     print(f"Successful: {successful}")
     print(f"Failed: {num_simulations - successful}")
+    if skipped:
+        print(f"Skipped (already finished or running elsewhere): {skipped}")
     print(f"Total time: {duration:.2f} seconds")
     print(f"Average time per simulation: {duration/num_simulations:.2f} seconds")
 
+    print(f"Scheduler: {get_scheduler().snapshot()}")
+    print(f"Logs: {log_file}")
+    if sink is not None:
+        print(f"Results: {sink.written} records written to {results_path}")
+
+    response_cache = (orchestrator_kwargs or {}).get("response_cache")
+    if response_cache is not None:
+        print(f"Response cache: {response_cache.stats()}")
+
+    speculation = get_metrics().counters("speculation")
+    if speculation:
+        drafts = speculation.get("drafts", 0)
+        print(f"Speculation: {speculation.get('hits', 0)} of {drafts} drafts used "
+              f"({speculation.get('hits', 0) / drafts:.0%}), ~{speculation.get('wasted_tokens', 0)} tokens wasted")
+
+    print(f"\n=== Call Sites ===")
+    print(get_metrics().report())
+    if metrics_path:
+        get_metrics().export(metrics_path)
+
 if __name__ == "__main__":
     """Single Threaded"""
-    # run_simulation(order_complexity="simple")
-    # run_simulation(order_complexity="medium")
-    run_simulation(order_complexity="complex")
-
-    """Multi Threaded"""
-    # Run parallel simulations with x simulations and y concurrent threads with z complexity
-    # run_parallel_simulations(num_simulations=10, max_workers=5, level="simple")
-    # run_parallel_simulations(num_simulations=5, max_workers=5, level="medium")
-    # run_parallel_simulations(num_simulations=10, max_workers=5, level="complex")
+    # asyncio.run(run_simulation(order_complexity="simple"))
+    # asyncio.run(run_simulation(order_complexity="medium"))
+    asyncio.run(run_simulation(order_complexity="complex"))
+
+    """Concurrent"""
+    # Optionally set per-endpoint budgets shared by every conversation, e.g.
+    # get_scheduler().configure("openai", requests_per_minute=500, tokens_per_minute=300000)
+    # Run concurrent simulations with x simulations and y conversations in flight with z complexity
+    # asyncio.run(run_parallel_simulations(num_simulations=10, max_workers=5, level="simple"))
+    # asyncio.run(run_parallel_simulations(num_simulations=5, max_workers=5, level="medium"))
+    # asyncio.run(run_parallel_simulations(num_simulations=10, max_workers=5, level="complex"))
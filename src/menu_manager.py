@@ -1,16 +1,99 @@
-from constants import MENU_JSON
+import difflib
+import re
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+from constants import get_menu_json
+
+# Precomputed option metadata. required is True only for unconditionally required options;
+# condition is an (option, value) pair for options required only when another option has that value.
+OptionSpec = namedtuple(
+    "OptionSpec",
+    ["name", "choices", "minimum", "maximum", "default", "required", "condition", "modifiers"]
+)
+
+def _normalize_name(name: str) -> str:
+    """Lowercase and collapse punctuation/whitespace so 'chicken nuggets (6 pc)' ~ 'Chicken Nuggets 6 Pc'."""
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+_menu_manager = None
+
+def get_menu_manager() -> "MenuManager":
+    """The process-wide MenuManager, so the menu indexes are built once however many users there are."""
+    global _menu_manager
+    if _menu_manager is None:
+        _menu_manager = MenuManager()
+    return _menu_manager
 
 class MenuManager:
     def __init__(self):
-        self.menu = MENU_JSON
+        self.menu = get_menu_json()
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Build the name, item type and option indexes once so lookups don't scan the menu."""
+        self._items_by_name = {}
+        self._items_by_normalized_name = {}
+        self._items_by_type = {}
+        self._option_specs = {}
+        self._option_spec_index = {}
+        for item_def in self.menu:
+            name = item_def["itemName"].lower()
+            self._items_by_name[name] = item_def
+            self._items_by_normalized_name[_normalize_name(name)] = item_def
+            self._items_by_type.setdefault(item_def.get("itemType"), []).append(item_def)
+            self._option_specs[name] = tuple(
+                self._build_option_spec(opt_name, opt_def)
+                for opt_name, opt_def in item_def.get("options", {}).items()
+            )
+            self._option_spec_index[name] = {spec.name: spec for spec in self._option_specs[name]}
+        self._normalized_names = list(self._items_by_normalized_name)
+
+    @staticmethod
+    def _build_option_spec(opt_name: str, opt_def: Dict) -> OptionSpec:
+        required = opt_def.get("required", False)
+        condition = None
+        if isinstance(required, dict):
+            condition = (required.get("option"), required.get("value"))
+            required = False
+        return OptionSpec(
+            name=opt_name,
+            choices=tuple(opt_def.get("choices", {}).keys()),
+            minimum=opt_def.get("minimum", 1),
+            maximum=opt_def.get("maximum", 1),
+            default=opt_def.get("defaultChoice"),
+            required=bool(required),
+            condition=condition,
+            modifiers=tuple(opt_def.get("modifiers", ()))
+        )
 
     def get_all_items(self):
         """Return a list of all item definitions from the menu."""
         return self.menu
 
+    def get_items_by_type(self, item_type: str) -> List[Dict]:
+        """Return all item definitions with the given itemType."""
+        return self._items_by_type.get(item_type, [])
+
     def find_item_definition(self, item_name):
         """Return the item definition for a given item name."""
-        for item_def in self.menu:
-            if item_def["itemName"].lower() == item_name.lower():
-                return item_def
-        return None
+        return self._items_by_name.get(item_name.lower())
+
+    def find_item_fuzzy(self, item_name: str, cutoff: float = 0.75) -> Optional[Dict]:
+        """Return the closest item definition for a loosely spelled name, or None."""
+        item_def = self.find_item_definition(item_name)
+        if item_def is not None:
+            return item_def
+        normalized = _normalize_name(item_name)
+        item_def = self._items_by_normalized_name.get(normalized)
+        if item_def is not None:
+            return item_def
+        matches = difflib.get_close_matches(normalized, self._normalized_names, n=1, cutoff=cutoff)
+        return self._items_by_normalized_name[matches[0]] if matches else None
+
+    def get_option_specs(self, item_name: str) -> Tuple[OptionSpec, ...]:
+        """Return the precomputed option metadata for an item, in menu order."""
+        return self._option_specs.get(item_name.lower(), ())
+
+    def get_option_spec(self, item_name: str, option_name: str) -> Optional[OptionSpec]:
+        """Return the precomputed metadata for one option of an item."""
+        return self._option_spec_index.get(item_name.lower(), {}).get(option_name)
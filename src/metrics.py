@@ -0,0 +1,146 @@
+import bisect
+import glob
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+# Latency bucket upper bounds in seconds, roughly 20% apart from 5ms to 5 minutes.
+# Fixed buckets keep histograms small and let snapshots from other processes merge exactly.
+LATENCY_BUCKETS = tuple(round(0.005 * 1.2 ** i, 4) for i in range(61))
+
+# USD per 1K (prompt, completion) tokens, for the cost column of the report
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+class SiteStats:
+    """Counters and a latency histogram for one call site, e.g. 'openai.customer_message'."""
+    def __init__(self):
+        self.counts = Counter()  # calls, errors, retries, cache_hits, prompt_tokens, completion_tokens
+        self.cost = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (within ~20% of the true value)."""
+        total = sum(self.buckets)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS[min(i, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+    def to_dict(self) -> Dict:
+        return {"counts": dict(self.counts), "cost": self.cost,
+                "buckets": self.buckets, "latency_sum": self.latency_sum}
+
+    def merge(self, data: Dict):
+        self.counts.update(data["counts"])
+        self.cost += data["cost"]
+        self.buckets = [a + b for a, b in zip(self.buckets, data["buckets"])]
+        self.latency_sum += data["latency_sum"]
+
+class Metrics:
+    """Thread-safe per-call-site metrics for one process; merge snapshots to aggregate processes."""
+    def __init__(self):
+        self.sites = {}
+        self._lock = threading.Lock()
+
+    def _site(self, name: str) -> SiteStats:
+        site = self.sites.get(name)
+        if site is None:
+            site = self.sites.setdefault(name, SiteStats())
+        return site
+
+    def record_call(self, name: str, seconds: float, error: bool = False, model: Optional[str] = None,
+                    prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            site = self._site(name)
+            site.counts["calls"] += 1
+            site.counts["errors"] += error
+            site.observe(seconds)
+            if prompt_tokens or completion_tokens:
+                site.counts["prompt_tokens"] += prompt_tokens
+                site.counts["completion_tokens"] += completion_tokens
+                prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+                site.cost += (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def increment(self, name: str, counter: str, amount: int = 1):
+        """Count retries, cache hits and the like for a call site."""
+        with self._lock:
+            self._site(name).counts[counter] += amount
+
+    def counters(self, name: str) -> Dict[str, int]:
+        with self._lock:
+            site = self.sites.get(name)
+            return dict(site.counts) if site else {}
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: site.to_dict() for name, site in self.sites.items()}
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        with self._lock:
+            for name, data in snapshot.items():
+                self._site(name).merge(data)
+
+    def reset(self):
+        with self._lock:
+            self.sites = {}
+
+    def export(self, path: str):
+        """Write a JSON snapshot (e.g. one per process) that merge_files can combine."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def report(self) -> str:
+        """Table of calls, latency percentiles, retries, tokens and cost per call site."""
+        header = f"{'call site':<36}{'calls':>7}{'err':>5}{'retry':>6}{'cache':>6}" \
+                 f"{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'tokens in':>11}{'out':>8}{'cost $':>9}"
+        lines = [header]
+        with self._lock:
+            for name in sorted(self.sites):
+                site = self.sites[name]
+                c = site.counts
+                p50, p95, p99 = (site.percentile(q) for q in (0.5, 0.95, 0.99))
+                lines.append(
+                    f"{name:<36}{c['calls']:>7}{c['errors']:>5}{c['retries']:>6}{c['cache_hits']:>6}"
+                    f"{_fmt(p50):>8}{_fmt(p95):>8}{_fmt(p99):>8}"
+                    f"{c['prompt_tokens']:>11}{c['completion_tokens']:>8}{site.cost:>9.3f}"
+                )
+        return "\n".join(lines)
+
+def _fmt(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds:.3f}"
+
+def merge_files(paths: Iterable[str]) -> Metrics:
+    """Combine snapshots exported by several processes (paths may be glob patterns)."""
+    merged = Metrics()
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)):
+            with open(path) as f:
+                merged.merge(json.load(f))
+    return merged
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    return _metrics
@@ -0,0 +1,331 @@
+"""
+Local stand-in for Lilac's order-agent API, for load testing without the test deployment.
+
+Implements /start, /chat and /order/{id} with the payloads LilacApiClient expects, plus
+configurable latency, 5xx error injection and scripted or menu-driven replies.
+
+    python src/mock_lilac_server.py --port 8765 --latency lognormal:-0.7,0.5 --error-rate 0.05
+    LILAC_API_BASE_URL=http://127.0.0.1:8765 python src/main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from menu_manager import MenuManager, OptionSpec, get_menu_manager
+
+ENDING_PHRASES = [
+    "that's all", "that's it", "that is all", "that'll be all", "nothing else",
+    "no thanks", "no thank you", "i'm done", "that will be it", "that's everything"
+]
+
+class LatencyModel:
+    """Samples per-request latency in seconds from a fixed, uniform or lognormal distribution."""
+    def __init__(self, kind: str = "fixed", params: Optional[List[float]] = None, seed: Optional[int] = None):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = params or [0.0]
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: Optional[int] = None) -> "LatencyModel":
+        """Parse 'fixed:0.5', 'uniform:0.2,1.0' or 'lognormal:mu,sigma'."""
+        kind, _, params = spec.partition(":")
+        return cls(kind, [float(p) for p in params.split(",")] if params else None, seed)
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                return self.rng.uniform(self.params[0], self.params[1])
+            if self.kind == "lognormal":
+                return self.rng.lognormvariate(self.params[0], self.params[1])
+            return self.params[0]
+
+class MockOrderAgent:
+    """
+    Menu-driven order agent. Recognizes item and option names from provided/menu.json in the
+    customer's message, asks for required options that are still missing, and closes the order
+    when the customer is done. With a script, replies cycle through it instead.
+    """
+    def __init__(self, menu_manager: Optional[MenuManager] = None, script: Optional[List[str]] = None):
+        self.menu_manager = menu_manager or get_menu_manager()
+        self.script = script
+        self.orders = {}
+        self._lock = threading.Lock()
+        # Longest names first so "Cheese Burger" wins over "Burger"-like substrings
+        self._item_names = sorted(
+            (item["itemName"] for item in self.menu_manager.get_all_items()), key=len, reverse=True
+        )
+
+    def start(self) -> str:
+        order_id = uuid.uuid4().hex
+        with self._lock:
+            self.orders[order_id] = {"messages": [], "items": [], "closed": False, "turns": 0}
+        return order_id
+
+    def get_order(self, order_id: str) -> Optional[Dict]:
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return None
+            return {"orderId": order_id, "order": [self._serialize_item(item) for item in order["items"]]}
+
+    def chat(self, order_id: str, message: str) -> Optional[Dict]:
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return None
+            reply = self._reply(order, message)
+            if self.script:
+                reply = self.script[order["turns"] % len(self.script)]
+            order["turns"] += 1
+            order["messages"].extend([
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": reply}
+            ])
+            return {"orderId": order_id, "messages": list(order["messages"])}
+
+    def _reply(self, order: Dict, message: str) -> str:
+        if order["closed"]:
+            return "Please pull forward to the window."
+
+        text = message.lower()
+        current = order["items"][-1] if order["items"] else None
+        changed = False
+        if current is not None:
+            text, changed = self._apply_options(current, text)
+
+        new_item = self._find_item(text)
+        if new_item is not None:
+            current = {"definition": new_item, "options": {}}
+            order["items"].append(current)
+            text, _ = self._apply_options(current, text.replace(new_item["itemName"].lower(), " "))
+            changed = True
+
+        missing = self._missing_option(current) if current is not None else None
+        if missing is not None:
+            return self._ask_for(current, missing)
+
+        if not changed and any(phrase in text for phrase in ENDING_PHRASES):
+            order["closed"] = True
+            total = sum(self._item_price(item) for item in order["items"])
+            return f"Your total is ${total:.2f}. Please pull forward."
+        if changed:
+            return f"Got it, I've added the {current['definition']['itemName']}. Anything else?"
+        if not order["items"]:
+            return "Welcome to Ben Frank's! What can I get for you today?"
+        return "Sorry, I didn't catch that. Anything else?"
+
+    def _find_item(self, text: str) -> Optional[Dict]:
+        for name in self._item_names:
+            # Lookarounds rather than \b, which never matches after a name ending in ')'
+            if re.search(rf"(?<!\w){re.escape(name.lower())}(?!\w)", text):
+                return self.menu_manager.find_item_definition(name)
+        return None
+
+    def _active_options(self, item: Dict) -> Dict[str, OptionSpec]:
+        """Options that apply to the item, skipping conditional ones whose condition isn't met."""
+        active = {}
+        for spec in self.menu_manager.get_option_specs(item["definition"]["itemName"]):
+            if spec.condition is not None:
+                condition_option, condition_value = spec.condition
+                if condition_value not in item["options"].get(condition_option, []):
+                    continue
+            active[spec.name] = spec
+        return active
+
+    def _apply_options(self, item: Dict, text: str):
+        """Set option values mentioned in text and return the text with them removed."""
+        changed = False
+        # Meal option first so meal-only options become active in the same message
+        options = sorted(item["definition"].get("options", {}), key=lambda name: name != "meal option")
+        for opt_name in options:
+            spec = self._active_options(item).get(opt_name)
+            # A filled single-choice option shouldn't swallow names meant as new items ("and a coke")
+            if spec is None or (spec.maximum == 1 and item["options"].get(opt_name)):
+                continue
+            modifiers = spec.modifiers
+            for choice in sorted(spec.choices, key=len, reverse=True):
+                pattern = rf"\b(?:({'|'.join(map(re.escape, modifiers))})\s+)?{re.escape(choice)}\b" if modifiers \
+                    else rf"\b{re.escape(choice)}\b"
+                match = re.search(pattern, text)
+                if not match:
+                    continue
+                value = f"{match.group(1) or 'add'} {choice}" if modifiers else choice
+                values = item["options"].setdefault(opt_name, [])
+                if value not in values:
+                    values.append(value)
+                text = text[:match.start()] + " " + text[match.end():]
+                changed = True
+        return text, changed
+
+    def _missing_option(self, item: Dict) -> Optional[str]:
+        for opt_name, spec in self._active_options(item).items():
+            # Active conditional options are required too
+            required = spec.required or spec.condition is not None
+            if required and spec.minimum > 0 and not item["options"].get(opt_name):
+                return opt_name
+        return None
+
+    def _ask_for(self, item: Dict, opt_name: str) -> str:
+        item_name = item["definition"]["itemName"]
+        if opt_name == "meal option":
+            return f"Would you like the {item_name} as a meal or a la carte?"
+        spec = self.menu_manager.get_option_spec(item_name, opt_name)
+        examples = ", ".join(spec.choices[:4])
+        return f"What {opt_name} would you like with your {item_name}? We have {examples} and more."
+
+    def _item_price(self, item: Dict) -> float:
+        options = item["definition"].get("options", {})
+        price = 0.0
+        for opt_name, values in item["options"].items():
+            choices = options[opt_name].get("choices", {})
+            for value in values:
+                choice = value.split(" ", 1)[1] if options[opt_name].get("modifiers") else value
+                price += choices.get(choice, {}).get("price", 0)
+        return price
+
+    @staticmethod
+    def _serialize_item(item: Dict) -> Dict:
+        keys = list(item["options"])
+        return {
+            "itemName": item["definition"]["itemName"],
+            "optionKeys": keys,
+            "optionValues": [list(item["options"][key]) for key in keys]
+        }
+
+class MockLilacServer(ThreadingHTTPServer):
+    """HTTP server holding the agent, latency model and error injection settings."""
+    daemon_threads = True
+
+    def __init__(self, address, agent: MockOrderAgent, latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0, error_codes: Optional[List[int]] = None,
+                 seed: Optional[int] = None, verbose: bool = False):
+        super().__init__(address, MockLilacHandler)
+        self.agent = agent
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.error_codes = error_codes or [500, 502, 503, 504]
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def pick_error(self) -> Optional[int]:
+        with self._lock:
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return self.rng.choice(self.error_codes)
+        return None
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+class MockLilacHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real deployment
+
+    def do_POST(self):
+        if self.path == "/start":
+            self._handle("start", lambda body: {"orderId": self.server.agent.start()})
+        elif self.path == "/chat":
+            self._handle("chat", lambda body: self.server.agent.chat(body.get("orderId"), body.get("input", "")))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_GET(self):
+        if self.path.startswith("/order/"):
+            order_id = self.path[len("/order/"):]
+            self._handle("order", lambda body: self.server.agent.get_order(order_id))
+        elif self.path == "/stats":
+            self._send(200, dict(self.server.stats))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _handle(self, endpoint: str, produce):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        self.server.count(f"{endpoint}_requests")
+        time.sleep(self.server.latency.sample())
+
+        error = self.server.pick_error()
+        if error is not None:
+            self.server.count(f"{endpoint}_errors_{error}")
+            self._send(error, {"error": "injected failure"})
+            return
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            self._send(400, {"error": "invalid JSON"})
+            return
+        result = produce(body)
+        if result is None:
+            self._send(404, {"error": "unknown orderId"})
+        else:
+            self._send(200, result)
+
+    def _send(self, status: int, payload: Dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def start_server_in_thread(host: str = "127.0.0.1", port: int = 0, **kwargs) -> MockLilacServer:
+    """Start a server on a background thread; port 0 picks a free port. Call shutdown() when done."""
+    server = MockLilacServer((host, port), kwargs.pop("agent", None) or MockOrderAgent(), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Lilac's order-agent API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S, uniform:LO,HI or lognormal:MU,SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 5xx")
+    parser.add_argument("--error-codes", default="500,502,503,504")
+    parser.add_argument("--script", help="JSON file with a list of replies to cycle through instead of menu-driven replies")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+
+    server = MockLilacServer(
+        (args.host, args.port),
+        MockOrderAgent(script=script),
+        latency=LatencyModel.parse(args.latency, args.seed),
+        error_rate=args.error_rate,
+        error_codes=[int(code) for code in args.error_codes.split(",")],
+        seed=args.seed,
+        verbose=args.verbose
+    )
+    print(f"Mock Lilac server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Replay recorded classifier calls against a candidate model to see whether it makes the same decisions.
+
+    python src/model_eval.py cassettes/ --model gpt-4o-mini
+    python src/model_eval.py cassettes/ --model gpt-4o-mini --call-sites needs_response,is_conversation_ending \
+        --output eval.json
+
+Inputs are the deterministic (temperature=0) OpenAI calls in cassettes recorded with
+run_parallel_simulations(cassette_dir=...), deduplicated. Each is sent to the candidate with
+its recorded messages and parameters, and the answer is compared with the recorded one after
+normalizing formatting. The report lists agreement rate, latency percentiles and cost per call
+site, and the LILAC_MODEL_ROUTES entry that would move the sites that pass --min-agreement.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from cassette import Cassette
+from conversation_orchestrator import ConversationOrchestrator, is_retryable, retry_delay
+from metrics import Metrics
+from scheduler import get_scheduler
+
+# Agreement needed before a call site is suggested for the candidate model
+DEFAULT_MIN_AGREEMENT = 0.98
+
+def cassette_paths(paths: List[str]) -> List[str]:
+    """Expand directories to the cassettes inside them."""
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))))
+        else:
+            expanded.extend(sorted(glob.glob(path)))
+    return expanded
+
+def load_cases(paths: List[str], call_sites: Optional[List[str]] = None) -> List[Dict]:
+    """Recorded temperature=0 completions as cases: call site, messages, params and the recorded answer."""
+    cases = {}
+    for path in cassette_paths(paths):
+        cassette = Cassette(path, mode="replay")
+        for interaction in cassette.interactions:
+            request = interaction["q"]
+            if interaction["k"] != "openai" or request["params"].get("temperature") != 0:
+                continue
+            if call_sites and request["call_site"] not in call_sites:
+                continue
+            # The same prompt recorded twice would only count the same decision twice; "model" is
+            # the one that gave the recorded answer, which is a fallback when the routed model failed
+            cases.setdefault(interaction["h"], {**request, "model": interaction["r"].get("model", request["model"]),
+                                                "expected": interaction["r"]["content"]})
+    return list(cases.values())
+
+def normalize_answer(call_site: str, content: Optional[str]):
+    """What the orchestrator actually uses from an answer, so formatting differences still agree."""
+    text = (content or "").strip()
+    if call_site == "turn_analysis":
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        try:
+            analysis = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            analysis = None
+        if isinstance(analysis, dict):
+            analysis["answered_questions"] = sorted(analysis.get("answered_questions") or [])
+            return analysis
+        return text
+    if call_site == "track_item_construction":
+        return sorted({line.strip().lstrip("- ").lower() for line in text.splitlines() if line.strip()})
+    return text.strip(" .\"'").lower()
+
+async def evaluate(cases: List[Dict], model: str, client=None, concurrency: int = 8,
+                   timeout: Optional[float] = 30.0) -> Dict:
+    """
+    Send every case to model and compare. Returns per-call-site agreement (with disagreeing
+    answers for inspection) and a Metrics of the candidate's latency, errors and cost.
+    Throttles, 5xx and connection errors are retried with the orchestrator's backoff.
+    """
+    # Retries happen in run_case so the shared scheduler sees every 429
+    client = client or AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    metrics = Metrics()
+    semaphore = asyncio.Semaphore(concurrency)
+    sites = {}
+
+    async def run_case(case: Dict):
+        call_site = case["call_site"]
+        site = sites.setdefault(call_site, {"cases": 0, "agreed": 0, "errors": 0, "disagreements": []})
+        options = {"timeout": timeout} if timeout else {}
+        async with semaphore:
+            start = time.monotonic()
+            for attempt in range(ConversationOrchestrator.MAX_API_RETRIES + 1):
+                try:
+                    # The exception leaves the slot, so the scheduler sees every 429
+                    async with get_scheduler().slot("openai"):
+                        response = await client.chat.completions.create(
+                            model=model, messages=case["messages"], **options, **case["params"]
+                        )
+                    break
+                except Exception as e:
+                    if not is_retryable(e) or attempt == ConversationOrchestrator.MAX_API_RETRIES:
+                        metrics.record_call(call_site, time.monotonic() - start, error=True, model=model)
+                        site["errors"] += 1
+                        site["disagreements"].append({"expected": case["expected"], "error": repr(e)})
+                        return
+                    metrics.increment(call_site, "retries")
+                    await asyncio.sleep(retry_delay(attempt))
+            metrics.record_call(call_site, time.monotonic() - start, model=model,
+                                prompt_tokens=getattr(response.usage, "prompt_tokens", 0),
+                                completion_tokens=getattr(response.usage, "completion_tokens", 0))
+        content = response.choices[0].message.content
+        site["cases"] += 1
+        if normalize_answer(call_site, content) == normalize_answer(call_site, case["expected"]):
+            site["agreed"] += 1
+        else:
+            site["disagreements"].append({"expected": case["expected"], "got": content,
+                                          "prompt": case["messages"][-1]["content"]})
+
+    await asyncio.gather(*(run_case(case) for case in cases))
+    for site in sites.values():
+        site["agreement"] = site["agreed"] / site["cases"] if site["cases"] else None
+    return {"model": model, "sites": sites, "metrics": metrics}
+
+def suggested_routes(result: Dict, min_agreement: float = DEFAULT_MIN_AGREEMENT) -> Dict[str, Dict]:
+    """Routes moving every call site that agreed often enough (and never errored) to the candidate."""
+    return {
+        call_site: {"model": result["model"]}
+        for call_site, site in sorted(result["sites"].items())
+        if site["agreement"] is not None and site["agreement"] >= min_agreement and not site["errors"]
+    }
+
+def report(result: Dict, min_agreement: float = DEFAULT_MIN_AGREEMENT) -> str:
+    lines = [f"{'call site':<28}{'cases':>7}{'agree':>7}{'rate':>8}{'errors':>8}{'p50 s':>8}{'p95 s':>8}{'cost $':>9}"]
+    metrics = result["metrics"]
+    for call_site, site in sorted(result["sites"].items()):
+        stats = metrics.sites[call_site]
+        p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+        rate = "-" if site["agreement"] is None else f"{site['agreement']:.1%}"
+        lines.append(f"{call_site:<28}{site['cases']:>7}{site['agreed']:>7}{rate:>8}{site['errors']:>8}"
+                     f"{_fmt(p50):>8}{_fmt(p95):>8}{stats.cost:>9.3f}")
+    routes = suggested_routes(result, min_agreement)
+    lines.append(f"\nCall sites at or above {min_agreement:.0%} agreement: "
+                 f"{json.dumps(routes) if routes else 'none'}")
+    return "\n".join(lines)
+
+def _fmt(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds:.3f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded classifier calls against a candidate model")
+    parser.add_argument("cassettes", nargs="+", help="cassette files, globs or directories of cassettes")
+    parser.add_argument("--model", required=True, help="candidate model, e.g. gpt-4o-mini")
+    parser.add_argument("--call-sites", help="comma-separated call sites to evaluate (default: all recorded)")
+    parser.add_argument("--limit", type=int, default=None, help="evaluate at most this many cases")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--min-agreement", type=float, default=DEFAULT_MIN_AGREEMENT)
+    parser.add_argument("--output", help="write agreement, disagreements and latency as JSON")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cassettes, args.call_sites.split(",") if args.call_sites else None)
+    if args.limit:
+        cases = cases[:args.limit]
+    if not cases:
+        sys.exit("No recorded temperature=0 calls found")
+    print(f"Replaying {len(cases)} recorded calls against {args.model}...")
+
+    result = asyncio.run(evaluate(cases, args.model, concurrency=args.concurrency, timeout=args.timeout))
+    print(report(result, args.min_agreement))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": result["model"], "sites": result["sites"],
+                       "metrics": result["metrics"].snapshot(),
+                       "suggested_routes": suggested_routes(result, args.min_agreement)}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import os
+from typing import Dict, List, Optional, Union
+
+# JSON object of per-call-site overrides, e.g. '{"needs_response": {"model": "gpt-4o-mini"}, "default": {"timeout": 20}}'
+ROUTES_ENV = "LILAC_MODEL_ROUTES"
+
+DEFAULT_ROUTE = {"model": "gpt-4", "timeout": 30.0, "fallbacks": ["gpt-4o"]}
+
+# Everything stays on gpt-4 until model_eval shows a cheaper model agrees on a call site's decisions
+DEFAULT_ROUTES = {
+    "customer_message": {"timeout": 60.0},
+    "customer_message_draft": {"timeout": 60.0},
+    "is_response_valid": {},
+    "turn_analysis": {},
+    "needs_response": {},
+    "is_conversation_ending": {},
+    "is_question_answered": {},
+    "is_item_completed": {},
+    "get_next_state": {},
+    "track_item_construction": {},
+}
+
+class ModelRoute:
+    """The model a call site uses, its per-request timeout, and the models to fall back to if it fails."""
+    def __init__(self, model: str, timeout: Optional[float] = None, fallbacks: Optional[List[str]] = None):
+        self.model = model
+        self.timeout = timeout
+        self.fallbacks = list(fallbacks or [])
+
+    @property
+    def models(self) -> List[str]:
+        """The model followed by its fallbacks, without repeats."""
+        return list(dict.fromkeys([self.model, *self.fallbacks]))
+
+    def to_dict(self) -> Dict:
+        return {"model": self.model, "timeout": self.timeout, "fallbacks": self.fallbacks}
+
+    def __repr__(self):
+        return f"ModelRoute({self.model!r}, timeout={self.timeout}, fallbacks={self.fallbacks})"
+
+class RoutingTable:
+    """Routes for every call site; sites without an entry use the 'default' route."""
+    def __init__(self, routes: Dict[str, ModelRoute], default: ModelRoute):
+        self.routes = routes
+        self.default = default
+
+    def route(self, call_site: str) -> ModelRoute:
+        return self.routes.get(call_site, self.default)
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {"default": self.default.to_dict(), **{site: route.to_dict() for site, route in self.routes.items()}}
+
+def load_routes(overrides: Optional[Dict[str, Union[str, Dict]]] = None) -> RoutingTable:
+    """
+    Build the routing table from DEFAULT_ROUTES, then the LILAC_MODEL_ROUTES environment
+    variable, then overrides. An override is a route dict or just a model name, and only
+    replaces the fields it sets; the 'default' entry applies to every call site.
+    """
+    layers = [json.loads(os.environ[ROUTES_ENV])] if os.getenv(ROUTES_ENV) else []
+    layers.append(overrides or {})
+
+    default = dict(DEFAULT_ROUTE)
+    sites = {site: dict(spec) for site, spec in DEFAULT_ROUTES.items()}
+    for layer in layers:
+        for site, spec in layer.items():
+            spec = {"model": spec} if isinstance(spec, str) else spec
+            unknown = set(spec) - set(DEFAULT_ROUTE)
+            if unknown:
+                raise ValueError(f"Unknown model route fields for {site}: {sorted(unknown)}")
+            if site == "default":
+                default.update(spec)
+            else:
+                sites.setdefault(site, {}).update(spec)
+    return RoutingTable({site: ModelRoute(**{**default, **spec}) for site, spec in sites.items()},
+                        ModelRoute(**default))
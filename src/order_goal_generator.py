@@ -1,14 +1,41 @@
+import itertools
 import random
-from menu_manager import MenuManager
+import weakref
+from collections import namedtuple
+from menu_manager import get_menu_manager
+
+# One option's draw for generate_batch: the choices, the selection counts it can take with their
+# cumulative weights (uniform, like randint), and the modifiers customizations are prefixed with
+OptionTable = namedtuple("OptionTable", ["choices", "counts", "cum_weights", "modifiers"])
+# The options generate_batch draws for an item in one mode. steps are (key, fixed values or
+# OptionTable) in option order; conditional is (key, OptionTable, option, value) for options
+# only added when the first value picked for option is value.
+ItemRecipe = namedtuple("ItemRecipe", ["steps", "conditional"])
+
+BATCH_MODES = ("simple", "meal", "regular")
+
+# Recipes per MenuManager, so generators sharing a menu build them once
+_recipes_by_menu = weakref.WeakKeyDictionary()
 
 class OrderGoalGenerator:
-    def __init__(self):
-        self.menu_manager = MenuManager()
+    def __init__(self, seed=None, menu_manager=None):
+        # The process-wide menu indexes unless a MenuManager is passed in
+        self.menu_manager = menu_manager or get_menu_manager()
+        # Own RNG instead of the global random module, which every thread shares
+        self.rng = random.Random(seed)
+        # Option tables for generate_batch, per (item name, mode)
+        self._recipes = _recipes_by_menu.get(self.menu_manager)
+        if self._recipes is None:
+            self._recipes = _recipes_by_menu.setdefault(self.menu_manager, {
+                (item_def["itemName"], mode): self._build_recipe(item_def, mode)
+                for item_def in self.menu_manager.get_all_items()
+                for mode in BATCH_MODES
+            })
 
     def generate_simple_order(self):
         """Generate a simple order with minimal customization."""
         items = self.menu_manager.get_all_items()
-        item_def = random.choice(items)
+        item_def = self.rng.choice(items)
         required_keys, required_values = self._pick_required_options(item_def, simple_mode=True)
         optional_keys, optional_values = [], []
 
@@ -22,9 +49,9 @@ class OrderGoalGenerator:
         """Generate a medium complexity order with an item with a lot of options."""
         print("Generating medium order")
         # Filter for items that can be meals
-        items = [item for item in self.menu_manager.get_all_items() if item.get("itemType") == "main - meal option"]
+        items = self.menu_manager.get_items_by_type("main - meal option")
         
-        item_def = random.choice(items)
+        item_def = self.rng.choice(items)
         required_keys, required_values = self._pick_required_options(item_def, meal_mode=True)
 
         return [{
@@ -37,13 +64,13 @@ class OrderGoalGenerator:
         """Generate a complex order with multiple items & customizations."""
         # Get all items and meal items
         all_items = self.menu_manager.get_all_items()
-        meal_items = [item for item in all_items if item.get("itemType") == "main - meal option"]
+        meal_items = self.menu_manager.get_items_by_type("main - meal option")
         
-        num_items = random.randint(2, 3)
+        num_items = self.rng.randint(2, 3)
         order_items = []
 
         # First, add one meal item
-        meal_item = random.choice(meal_items)
+        meal_item = self.rng.choice(meal_items)
         required_keys, required_values = self._pick_required_options(meal_item, meal_mode=True)
         order_items.append({
             "itemName": meal_item["itemName"],
@@ -53,7 +80,7 @@ class OrderGoalGenerator:
 
         # Then add remaining random items
         for _ in range(num_items - 1):
-            item_def = random.choice(all_items)
+            item_def = self.rng.choice(all_items)
             required_keys, required_values = self._pick_required_options(item_def)
             order_items.append({
                 "itemName": item_def["itemName"],
@@ -63,24 +90,136 @@ class OrderGoalGenerator:
 
         return order_items
 
+    def generate_batch(self, n, complexity="simple", seed=None):
+        """
+        Generate n order goals with a dedicated RNG, reproducible for a given seed, with the same
+        distribution as the generate_*_order methods. Items for the whole batch are drawn up front,
+        then each item's options are drawn in bulk from its precomputed option tables, one
+        rng.choices call per option across every goal containing that item.
+        Goals come back in compact form, a tuple of (itemName, optionKeys, optionValues) tuples;
+        use expand_goal() for the usual list of dicts.
+        """
+        rng = random.Random(seed)
+        all_names = [item_def["itemName"] for item_def in self.menu_manager.get_all_items()]
+        meal_names = [item_def["itemName"] for item_def in self.menu_manager.get_items_by_type("main - meal option")]
+
+        # Each plan is a list of (item name, mode)
+        if complexity == "simple":
+            plans = [[(name, "simple")] for name in rng.choices(all_names, k=n)]
+        elif complexity == "medium":
+            plans = [[(name, "meal")] for name in rng.choices(meal_names, k=n)]
+        else:
+            sizes = rng.choices((2, 3), k=n)
+            meals = rng.choices(meal_names, k=n)
+            extras = iter(rng.choices(all_names, k=sum(sizes) - n))
+            plans = [
+                [(meal_name, "meal")] + [(next(extras), "regular") for _ in range(size - 1)]
+                for meal_name, size in zip(meals, sizes)
+            ]
+
+        # Group item slots by (item, mode) so each option is drawn once for all of them
+        slots = {}
+        for goal_index, plan in enumerate(plans):
+            for position, entry in enumerate(plan):
+                slots.setdefault(entry, []).append((goal_index, position))
+
+        goals = [[None] * len(plan) for plan in plans]
+        for (name, mode), positions in slots.items():
+            for (goal_index, position), (keys, values) in zip(
+                    positions, self._draw_options(self._recipes[name, mode], len(positions), rng)):
+                goals[goal_index][position] = (name, keys, values)
+        return [tuple(goal) for goal in goals]
+
+    def _build_recipe(self, item_def, mode):
+        """What _pick_required_options does for item_def in mode, as fixed values and option tables."""
+        simple_mode, meal_mode = mode == "simple", mode == "meal"
+        steps = []
+        conditional = []
+        for spec in self.menu_manager.get_option_specs(item_def["itemName"]):
+            if spec.condition is not None:
+                if not simple_mode:
+                    conditional.append((spec.name, self._option_table(spec)) + tuple(spec.condition))
+            elif spec.required or not simple_mode:
+                if spec.required and simple_mode and spec.name == "meal option":
+                    steps.append((spec.name, ("a la carte",)))
+                elif spec.required and meal_mode and spec.name == "meal option":
+                    steps.append((spec.name, ("meal",)))
+                elif simple_mode and spec.minimum == 0:
+                    steps.append((spec.name, ()))
+                elif simple_mode and spec.name != "customizations" and spec.default and spec.default in spec.choices:
+                    steps.append((spec.name, (spec.default,)))
+                else:
+                    steps.append((spec.name, self._option_table(spec)))
+        return ItemRecipe(tuple(steps), tuple(conditional))
+
+    @staticmethod
+    def _option_table(spec):
+        counts = tuple(range(spec.minimum, min(spec.maximum, 4) + 1))
+        modifiers = (spec.modifiers or ("",)) if spec.name == "customizations" else None
+        return OptionTable(spec.choices, counts, tuple(itertools.accumulate([1] * len(counts))), modifiers)
+
+    @staticmethod
+    def _draw_values(table, m, rng):
+        """Values of one option for m item slots, drawn in bulk where choices are independent."""
+        counts = rng.choices(table.counts, cum_weights=table.cum_weights, k=m)
+        # Single picks are independent draws; larger picks must not repeat a choice
+        singles = iter(rng.choices(table.choices, k=counts.count(1)))
+        picks = [
+            () if count == 0 else (next(singles),) if count == 1 else tuple(rng.sample(table.choices, count))
+            for count in counts
+        ]
+        if table.modifiers is None:
+            return picks
+        modifiers = iter(rng.choices(table.modifiers, k=sum(counts)))
+        return [tuple(f"{next(modifiers)} {choice}" for choice in pick) for pick in picks]
+
+    def _draw_options(self, recipe, m, rng):
+        """(optionKeys, optionValues) for m slots of one item and mode."""
+        keys = [[] for _ in range(m)]
+        values = [[] for _ in range(m)]
+        for key, step in recipe.steps:
+            column = self._draw_values(step, m, rng) if isinstance(step, OptionTable) else [step] * m
+            for i in range(m):
+                keys[i].append(key)
+                values[i].append(column[i])
+        # The value conditions are checked against is the first one picked for that option
+        for key, table, option, value in recipe.conditional:
+            matching = [
+                i for i in range(m)
+                if option in keys[i] and values[i][keys[i].index(option)][:1] == (value,)
+            ]
+            for i, drawn in zip(matching, self._draw_values(table, len(matching), rng)):
+                keys[i].append(key)
+                values[i].append(drawn)
+        return [(tuple(k), tuple(v)) for k, v in zip(keys, values)]
+
+    @staticmethod
+    def expand_goal(compact_goal):
+        """Convert a compact goal from generate_batch into the list-of-dicts order format."""
+        return [{
+            "itemName": item_name,
+            "optionKeys": list(keys),
+            "optionValues": [list(v) for v in values]
+        } for item_name, keys, values in compact_goal]
+
     def _pick_required_options(self, item_def, simple_mode=False, meal_mode=False): #alter the mode to string type
         """Pick required options based on the menu item definition."""
         keys = []
         values = []
         selected_values = {} 
         
-        # Get all options from the item definition
-        options = item_def.get("options", {})
+        # Get the precomputed option metadata for the item
+        option_specs = self.menu_manager.get_option_specs(item_def["itemName"])
 
         # First pass: handle unconditionally required options
-        for opt_name, opt_def in options.items():
+        for spec in option_specs:
+            opt_name = spec.name
 
-            is_required = opt_def.get("required", False)
             # Skip conditional requirements in first pass
-            if isinstance(is_required, dict):
+            if spec.condition is not None:
                 continue
             
-            if is_required: # reorder to handle string type for simple type vs medium type
+            if spec.required: # reorder to handle string type for simple type vs medium type
                 keys.append(opt_name)
                 # In simple mode, always choose 'a la carte' for meal options
                 if simple_mode and opt_name == "meal option":
@@ -90,14 +229,14 @@ class OrderGoalGenerator:
                     values.append(["meal"])
                     selected_values[opt_name] = "meal"
                 else:
-                    selected_value = self._pick_option_value(opt_name, opt_def, simple_mode)
+                    selected_value = self._pick_option_value(spec, simple_mode)
                     values.append(selected_value)
                     if selected_value:
                         selected_values[opt_name] = selected_value[0]   
             # do optional values here
-            elif not simple_mode and not is_required:
+            elif not simple_mode:
                 keys.append(opt_name)
-                selected_value = self._pick_option_value(opt_name, opt_def, simple_mode)
+                selected_value = self._pick_option_value(spec, simple_mode)
                 values.append(selected_value)
                 if selected_value:
                     selected_values[opt_name] = selected_value[0]
@@ -105,47 +244,44 @@ class OrderGoalGenerator:
         # Skip conditional requirements in simple mode
         if not simple_mode:
             # Second pass: handle conditional requirements
-            for opt_name, opt_def in options.items():
-                is_required = opt_def.get("required", False)
-                
-                if isinstance(is_required, dict):
+            for spec in option_specs:
+                if spec.condition is not None:
                     # Check if condition is met
-                    condition_option = is_required.get("option")
-                    condition_value = is_required.get("value")
+                    condition_option, condition_value = spec.condition
                     
                     if (condition_option in selected_values and 
                         selected_values[condition_option] == condition_value):
-                        keys.append(opt_name)
-                        selected_value = self._pick_option_value(opt_name, opt_def, simple_mode)
+                        keys.append(spec.name)
+                        selected_value = self._pick_option_value(spec, simple_mode)
                         values.append(selected_value)
         
         return keys, values
 
-    def _pick_option_value(self, opt_name, opt_def, simple_mode=False):
+    def _pick_option_value(self, spec, simple_mode=False):
         """Helper method to pick appropriate values for an option."""
-        choices = opt_def.get("choices", {})
-        default = opt_def.get("defaultChoice")
-        min_selections = opt_def.get("minimum", 1)
+        choices = spec.choices
+        default = spec.default
+        min_selections = spec.minimum
         
         # In simple mode, return empty list if minimum selections can be 0
         if simple_mode and min_selections == 0:
             return []
         
         # Special handling for customizations
-        if opt_name == "customizations":
-            modifiers = opt_def.get("modifiers", [""])
-            max_selections = min(opt_def.get("maximum", 1), 4)  # Limit to 3 selections
-            num_selections = random.randint(min_selections, max_selections)
+        if spec.name == "customizations":
+            modifiers = spec.modifiers or ("",)
+            max_selections = min(spec.maximum, 4)  # Limit to 3 selections
+            num_selections = self.rng.randint(min_selections, max_selections)
             
-            selected_items = random.sample(list(choices.keys()), num_selections)
-            selected_with_modifiers = [f"{random.choice(modifiers)} {item}" for item in selected_items]
+            selected_items = self.rng.sample(choices, num_selections)
+            selected_with_modifiers = [f"{self.rng.choice(modifiers)} {item}" for item in selected_items]
             return selected_with_modifiers
         
         # Handle regular options
         if simple_mode and default and default in choices:
             return [default]
         else:
-            max_selections = min(opt_def.get("maximum", 1), 4)  # Limit to 4 selections
-            num_selections = random.randint(min_selections, max_selections)
+            max_selections = min(spec.maximum, 4)  # Limit to 4 selections
+            num_selections = self.rng.randint(min_selections, max_selections)
             
-            return random.sample(list(choices.keys()), num_selections)
+            return self.rng.sample(choices, num_selections)
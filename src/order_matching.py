@@ -0,0 +1,143 @@
+import difflib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from menu_manager import MenuManager, OptionSpec, get_menu_manager
+
+# (itemName, frozenset of (option key, frozenset of values)); empty options are dropped
+CanonicalItem = Tuple[str, FrozenSet[Tuple[str, FrozenSet[str]]]]
+
+DEFAULT_MODIFIER = "add"
+
+@lru_cache(maxsize=1024)
+def _choices_by_lowercase(spec: OptionSpec) -> Dict[str, str]:
+    return {choice.lower(): choice for choice in spec.choices}
+
+@lru_cache(maxsize=8192)
+def _canonical_choice(value: str, spec: Optional[OptionSpec]) -> str:
+    """Map a (lowercased) value onto the menu's spelling of the choice when it's close enough."""
+    if spec is None or value in spec.choices:
+        return value
+    # Values arrive lowercased, so compare against lowercased choices ('vanila' ~ 'Vanilla')
+    choices = _choices_by_lowercase(spec)
+    matches = difflib.get_close_matches(value.lower(), choices, n=1, cutoff=0.85)
+    return choices[matches[0]] if matches else value
+
+@lru_cache(maxsize=4096)
+def _canonical_item_name(menu_manager: MenuManager, item_name: str) -> str:
+    item_def = menu_manager.find_item_fuzzy(item_name)
+    return item_def["itemName"] if item_def else item_name.strip()
+
+def normalize_value(value: str, spec: Optional[OptionSpec]) -> str:
+    """Lowercase and canonicalize one option value, splitting out modifiers ('no mayo', 'extra pickles')."""
+    value = " ".join(str(value).lower().split())
+    if spec is not None and spec.modifiers:
+        modifier, _, rest = value.partition(" ")
+        if modifier in spec.modifiers and rest:
+            choice = rest
+        else:
+            # A bare customization means adding it
+            modifier, choice = DEFAULT_MODIFIER, value
+        return f"{modifier} {_canonical_choice(choice, spec)}"
+    return _canonical_choice(value, spec)
+
+def canonical_item(item: Dict, menu_manager: Optional[MenuManager] = None) -> CanonicalItem:
+    """Order-insensitive, hashable form of an order item normalized with the menu's option schema."""
+    menu_manager = menu_manager or get_menu_manager()
+    item_name = _canonical_item_name(menu_manager, item["itemName"])
+
+    options = []
+    for key, values in zip(item.get("optionKeys", []), item.get("optionValues", [])):
+        if isinstance(values, str):
+            values = [values]
+        values = [v for v in values or [] if v and str(v).strip()]
+        if not values:
+            continue
+        key = key.lower().strip()
+        spec = menu_manager.get_option_spec(item_name, key)
+        options.append((key, frozenset(normalize_value(v, spec) for v in values)))
+    return item_name.lower(), frozenset(options)
+
+def items_match(goal_item: Dict, order_item: Dict, menu_manager: Optional[MenuManager] = None) -> bool:
+    return canonical_item(goal_item, menu_manager) == canonical_item(order_item, menu_manager)
+
+def count_matches(item: Dict, items: List[Dict], menu_manager: Optional[MenuManager] = None) -> int:
+    """How many entries of items are the same as item."""
+    target = canonical_item(item, menu_manager)
+    return sum(1 for other in items if canonical_item(other, menu_manager) == target)
+
+def canonical_order(items: List[Dict], menu_manager: Optional[MenuManager] = None) -> Counter:
+    """Multiset of canonical items, so the same order in any item sequence compares equal."""
+    return Counter(canonical_item(item, menu_manager) for item in items)
+
+def _option_diff(goal: CanonicalItem, final: CanonicalItem) -> Dict[str, Dict[str, List[str]]]:
+    goal_options, final_options = dict(goal[1]), dict(final[1])
+    diff = {}
+    for key in sorted(goal_options.keys() | final_options.keys()):
+        expected = goal_options.get(key, frozenset())
+        actual = final_options.get(key, frozenset())
+        if expected != actual:
+            diff[key] = {"missing": sorted(expected - actual), "extra": sorted(actual - expected)}
+    return diff
+
+def diff_orders(goal_order: List[Dict], final_order: List[Dict],
+                menu_manager: Optional[MenuManager] = None) -> Dict:
+    """
+    Compare two orders as multisets of canonical items. Unmatched goal and final items with the
+    same name are paired up and reported as option mismatches; the rest are missing or extra.
+    """
+    goal, final = canonical_order(goal_order, menu_manager), canonical_order(final_order, menu_manager)
+    missing = list((goal - final).elements())
+    extra = list((final - goal).elements())
+
+    items = []
+    for goal_item in missing:
+        paired = next((i for i, final_item in enumerate(extra) if final_item[0] == goal_item[0]), None)
+        if paired is None:
+            items.append({"item": goal_item[0], "status": "missing", "options": {}})
+        else:
+            items.append({"item": goal_item[0], "status": "mismatch",
+                          "options": _option_diff(goal_item, extra.pop(paired))})
+    items.extend({"item": final_item[0], "status": "extra", "options": {}} for final_item in extra)
+
+    return {
+        "match": not items,
+        "matched_items": sum((goal & final).values()),
+        "goal_items": sum(goal.values()),
+        "final_items": sum(final.values()),
+        "items": items
+    }
+
+def score_orders(results: Iterable[Tuple[List[Dict], List[Dict]]],
+                 menu_manager: Optional[MenuManager] = None) -> Dict:
+    """
+    Score many (goal_order, final_order) pairs without printing. Returns aggregate accuracy,
+    item precision/recall, error counts by item and option, and the per-result diffs.
+    """
+    menu_manager = menu_manager or get_menu_manager()
+    diffs = []
+    errors_by_item = Counter()
+    errors_by_option = Counter()
+    totals = Counter()
+    for goal_order, final_order in results:
+        diff = diff_orders(goal_order, final_order, menu_manager)
+        diffs.append(diff)
+        totals["exact"] += diff["match"]
+        totals["matched_items"] += diff["matched_items"]
+        totals["goal_items"] += diff["goal_items"]
+        totals["final_items"] += diff["final_items"]
+        for item in diff["items"]:
+            errors_by_item[(item["item"], item["status"])] += 1
+            for key in item["options"]:
+                errors_by_option[(item["item"], key)] += 1
+
+    return {
+        "total": len(diffs),
+        "exact_matches": totals["exact"],
+        "accuracy": totals["exact"] / len(diffs) if diffs else 0.0,
+        "item_precision": totals["matched_items"] / totals["final_items"] if totals["final_items"] else 0.0,
+        "item_recall": totals["matched_items"] / totals["goal_items"] if totals["goal_items"] else 0.0,
+        "errors_by_item": dict(errors_by_item),
+        "errors_by_option": dict(errors_by_option),
+        "diffs": diffs
+    }
@@ -0,0 +1,65 @@
+import asyncio
+import random
+from typing import Optional, Union
+
+class PacingPolicy:
+    """Decides how long the simulated customer waits before each turn. The base policy never waits."""
+    def delay(self, state: str) -> float:
+        return 0.0
+
+    async def wait(self, state: str):
+        """Sleep without blocking the event loop, so other conversations keep running."""
+        seconds = self.delay(state)
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+class NoDelay(PacingPolicy):
+    """Throughput mode for batch regression runs."""
+
+class FixedDelay(PacingPolicy):
+    def __init__(self, seconds: float = 1.0):
+        self.seconds = seconds
+
+    def delay(self, state: str) -> float:
+        return self.seconds
+
+class HumanThinkTime(PacingPolicy):
+    """
+    Lognormal think time around a median, clipped to [minimum, maximum].
+    Placing an order takes longer to think about than a greeting or a yes/no clarification.
+    """
+    STATE_FACTORS = {"GREET": 0.5, "CLARIFY": 0.8, "ORDER": 1.3, "QUESTION": 1.0, "PRE-DONE": 0.7}
+
+    def __init__(self, median: float = 1.5, sigma: float = 0.5, minimum: float = 0.3,
+                 maximum: float = 8.0, seed: Optional[int] = None):
+        self.median = median
+        self.sigma = sigma
+        self.minimum = minimum
+        self.maximum = maximum
+        self.rng = random.Random(seed)
+
+    def delay(self, state: str) -> float:
+        sample = self.median * self.rng.lognormvariate(0, self.sigma) * self.STATE_FACTORS.get(state, 1.0)
+        return min(self.maximum, max(self.minimum, sample))
+
+def make_pacing(pacing: Union[PacingPolicy, str, float, None]) -> PacingPolicy:
+    """
+    Build a policy from a policy object, a number of seconds, or a spec:
+    'none', 'fixed:SECONDS' or 'human[:MEDIAN,SIGMA]'. None keeps the original one second per turn.
+    """
+    if isinstance(pacing, PacingPolicy):
+        return pacing
+    if pacing is None:
+        return FixedDelay(1.0)
+    if isinstance(pacing, (int, float)):
+        return FixedDelay(float(pacing)) if pacing > 0 else NoDelay()
+
+    kind, _, params = pacing.partition(":")
+    values = [float(p) for p in params.split(",")] if params else []
+    if kind == "none":
+        return NoDelay()
+    if kind == "fixed":
+        return FixedDelay(*values)
+    if kind == "human":
+        return HumanThinkTime(*values)
+    raise ValueError(f"Unknown pacing policy: {pacing!r}")
@@ -0,0 +1,111 @@
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Token budget for the whole prompt (all messages) of each call site. Prompts over budget
+# have their least important context trimmed first; anything still over is logged and counted.
+PROMPT_TOKEN_BUDGETS = {
+    "customer_message": 900,
+    "customer_message_draft": 900,
+    "turn_analysis": 1000,
+    "get_next_state": 500,
+    "track_item_construction": 900,
+}
+DEFAULT_PROMPT_BUDGET = 600
+
+# Trailing words that add nothing to an option key: 'side options' -> 'side'
+_KEY_SUFFIX = re.compile(r"\s+options?$")
+# Longest last staff message kept when the prompt has to be trimmed
+_TRIMMED_MESSAGE_CHARS = 300
+
+def estimate_tokens(text: str) -> int:
+    """Offline token estimate (about four characters per token for English prompts)."""
+    return (len(text) + 3) // 4
+
+def compact_text(text: str) -> str:
+    """Drop the indentation of triple-quoted prompts and collapse runs of blank lines."""
+    lines = []
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+def encode_item(item: Optional[Dict]) -> str:
+    """
+    One goal item as a line, e.g. 'Plain Classic Hot Dog (customizations: no mayo; meal: meal; side: fries)'.
+    Options without values are dropped and key names shortened.
+    """
+    if not item:
+        return "none"
+    options = [
+        f"{_KEY_SUFFIX.sub('', key)}: {', '.join(values)}"
+        for key, values in zip(item.get("optionKeys", []), item.get("optionValues", []))
+        if values
+    ]
+    return f"{item['itemName']} ({'; '.join(options)})" if options else item["itemName"]
+
+def encode_items(items: List[Dict]) -> str:
+    """Items in order, identical ones listed once with a count, e.g. '2x Red Bull | Swiss Mushroom Burger'."""
+    counts = Counter(encode_item(item) for item in items)
+    return " | ".join(f"{count}x {line}" if count > 1 else line for line, count in counts.items()) or "none"
+
+def encode_build(lines: List[str]) -> str:
+    """The running item build ('- new_item: ...' lines from item tracking) on one line."""
+    parts = [line.strip().lstrip("- ") for line in lines]
+    return "; ".join(part for part in parts if part and part.lower() != "none") or "none"
+
+def encode_questions(questions: List[str]) -> str:
+    return " | ".join(dict.fromkeys(question.strip() for question in questions)) or "none"
+
+def encode_context(context: Dict) -> Dict[str, str]:
+    """The conversation context fields prompts show, compactly encoded."""
+    return {
+        "order_goal": encode_items(context["order_goal"]),
+        "current_item": encode_item(context["current_item"]),
+        "items_in_progress": encode_build(context["items_in_progress"]),
+        "ordered_items": encode_items(context["ordered_items"]),
+        "pending_questions": encode_questions(context["pending_questions"]),
+        "last_agent_message": context["last_agent_message"] or "none",
+    }
+
+def _summarize_ordered(context: Dict, fields: Dict[str, str]):
+    fields["ordered_items"] = f"{len(context['ordered_items'])} items (details omitted)"
+
+def _latest_questions(context: Dict, fields: Dict[str, str]):
+    fields["pending_questions"] = encode_questions(context["pending_questions"][-2:])
+
+def _shorten_last_message(context: Dict, fields: Dict[str, str]):
+    message = fields["last_agent_message"]
+    if len(message) > _TRIMMED_MESSAGE_CHARS:
+        fields["last_agent_message"] = message[:_TRIMMED_MESSAGE_CHARS - 3] + "..."
+
+def _next_goal_items(context: Dict, fields: Dict[str, str]):
+    goal = context["order_goal"]
+    if len(goal) > 2:
+        fields["order_goal"] = f"{encode_items(goal[:2])} | ... and {len(goal) - 2} more items"
+
+# Applied in order until the prompt fits: the context the next message depends on least goes first
+TRIM_STEPS = (
+    ("ordered_items", _summarize_ordered),
+    ("pending_questions", _latest_questions),
+    ("last_agent_message", _shorten_last_message),
+    ("order_goal", _next_goal_items),
+)
+
+def fit_to_budget(render: Callable[[Dict[str, str]], str], context: Dict,
+                  budget: Optional[int]) -> Tuple[str, List[str]]:
+    """
+    Render a prompt from the encoded context, trimming fields until it fits in budget tokens.
+    Returns the prompt and the names of the trimmed fields.
+    """
+    fields = encode_context(context)
+    text = render(fields)
+    trimmed = []
+    for name, step in TRIM_STEPS:
+        if budget is None or estimate_tokens(text) <= budget:
+            break
+        step(context, fields)
+        trimmed.append(name)
+        text = render(fields)
+    return text, trimmed
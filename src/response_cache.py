@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class ResponseCache:
+    """
+    Content-addressed cache for deterministic (temperature=0) completions.
+    An in-memory LRU sits in front of an optional SQLite file that can be shared
+    across threads and processes. Entries expire after ttl_seconds.
+    From async code use aget/aset, which keep SQLite reads and writes off the event loop.
+    """
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 2048,
+                 max_disk_entries: int = 100_000, ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()  # the LRU and counters
+        self._disk_lock = threading.Lock()  # the SQLite connection, held only by the thread doing disk I/O
+        self._conn = None
+        self._conn_pid = None
+        self._sets_since_evict = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connect()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], **params) -> str:
+        """Hash the model, messages and sampling parameters into a cache key."""
+        payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        # SQLite connections can't be carried across fork, so reopen in each process
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+            self._conn.commit()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        return value if value is not None else self._disk_get(key, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop: the in-memory LRU is checked inline, the SQLite file in a worker thread."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        if self.path:
+            return await asyncio.to_thread(self._disk_get, key, now)
+        return self._disk_get(key, now)
+
+    def set(self, key: str, value: str):
+        """Store value under key in both tiers."""
+        now = time.time()
+        self._memory_set(key, now, value)
+        if self.path:
+            self._disk_set(key, now, value)
+
+    async def aset(self, key: str, value: str):
+        """set() for the event loop: the SQLite write runs in a worker thread."""
+        now = time.time()
+        self._memory_set(key, now, value)
+        if self.path:
+            await asyncio.to_thread(self._disk_set, key, now, value)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0], now):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return entry[1]
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        """Look key up in the SQLite file (if any), promoting a hit into memory; counts the miss otherwise."""
+        row = None
+        if self.path:
+            with self._disk_lock:
+                row = self._connect().execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+        with self._lock:
+            if row is not None and not self._expired(row[1], now):
+                self._remember(key, row[1], row[0])
+                self.counters["disk_hits"] += 1
+                return row[0]
+            self.counters["misses"] += 1
+            return None
+
+    def _memory_set(self, key: str, now: float, value: str):
+        with self._lock:
+            self._remember(key, now, value)
+            self.counters["sets"] += 1
+
+    def _disk_set(self, key: str, now: float, value: str):
+        with self._disk_lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, now)
+            )
+            conn.commit()
+            # Evicting on every write would make each set a table scan
+            self._sets_since_evict += 1
+            if self._sets_since_evict >= 100:
+                self._sets_since_evict = 0
+                self._evict_disk(conn, now)
+
+    def _evict_disk(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then the oldest rows beyond max_disk_entries."""
+        evicted = 0
+        if self.ttl_seconds is not None:
+            evicted += conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+        evicted += conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        ).rowcount
+        conn.commit()
+        with self._lock:
+            self.counters["evictions"] += evicted
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._disk_lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return the hit/miss counters and the overall hit rate."""
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._disk_lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
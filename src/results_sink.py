@@ -0,0 +1,94 @@
+import asyncio
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+_CLOSE = object()
+
+class ResultsSink:
+    """
+    Append-only JSONL writer for per-simulation results, safe to share across workers and threads.
+    Records are queued and written in batches by a background thread; the queue is bounded,
+    so a slow disk applies backpressure instead of growing memory with the batch size.
+    Async code writes with awrite, which waits for room in a worker thread rather than on the event loop.
+    A path ending in .gz is written as gzip (one member per flush, readable with gzip.open).
+    """
+    def __init__(self, path: str, batch_size: int = 50, flush_interval: float = 1.0, max_pending: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="results-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict):
+        """Queue one record; blocks only while max_pending records are waiting to be written."""
+        if not self._thread.is_alive():
+            raise RuntimeError("ResultsSink is closed")
+        self._queue.put(record)
+
+    async def awrite(self, record: Dict):
+        """Queue one record without blocking the event loop; when the queue is full, wait for room off the loop."""
+        if not self._thread.is_alive():
+            raise RuntimeError("ResultsSink is closed")
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, record)
+
+    def _open(self):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "at", encoding="utf-8")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _run(self):
+        closing = False
+        while not closing:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is _CLOSE:
+                    closing = True
+                    break
+                batch.append(record)
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        lines = [json.dumps(record, default=str) + "\n" for record in batch]
+        with self._open() as f:
+            f.writelines(lines)
+            f.flush()
+        self.written += len(batch)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything queued so far and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def read_results(path: str):
+    """Iterate over the records in a results file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+DEFAULT_PRIORITY = 5  # lower runs first
+DECREASE_COOLDOWN = 1.0  # seconds; one burst of 429s should only halve the limit once
+# Without an explicit latency_target, a call counts as slow at this multiple of the observed median
+# of calls at its priority (call sites differ in priority and in how long their answers take)
+LATENCY_TOLERANCE = 3.0
+# Successful calls observed before the median is trusted
+LATENCY_WARMUP = 20
+# Per-call step of the running median estimate; small enough that a slowdown stands out for a while
+MEDIAN_STEP = 0.02
+
+def status_of(exc: BaseException) -> Optional[int]:
+    """Return the HTTP status carried by an OpenAI or httpx error, if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+def is_throttle(exc: BaseException) -> bool:
+    return status_of(exc) == 429
+
+class TokenBucket:
+    """Continuously refilling budget of per_minute units, allowing bursts of a tenth of a minute."""
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute / 10.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount can be taken (amounts above capacity only wait for a full bucket)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+class EndpointLimiter:
+    """
+    Admission control for one endpoint: request and token budgets, an AIMD concurrency limit
+    driven by 429s and latency, and a priority queue of waiting calls. Calls slower than
+    latency_target, or by default LATENCY_TOLERANCE times the observed median latency of calls
+    at the same priority, shrink the limit.
+    Waiters are asyncio futures, so a limiter serves one event loop at a time.
+    """
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, initial_concurrency: int = 16,
+                 min_concurrency: int = 1, max_concurrency: int = 512,
+                 latency_target: Optional[float] = None):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency_limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.median_latency = {}  # priority -> running estimate of successful calls' p50
+        self._latency_samples = Counter()
+        self.in_flight = 0
+        self.stats = Counter()
+        self._waiters = []  # heap of (priority, seq, future, tokens)
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._wake_handle = None
+        self._wake_loop = None
+
+    async def acquire(self, priority: int = DEFAULT_PRIORITY, tokens: float = 0):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, tokens))
+        # Admits immediately when there is capacity and nothing more urgent is waiting
+        self._wake()
+        if not future.done():
+            self.stats["queued"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Admitted just before cancellation: give the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _try_admit(self, tokens: float) -> bool:
+        if self.in_flight >= int(self.concurrency_limit):
+            return False
+        wait = 0.0
+        if self.request_bucket:
+            wait = self.request_bucket.time_until(1)
+        if self.token_bucket and tokens:
+            wait = max(wait, self.token_bucket.time_until(tokens))
+        if wait > 0:
+            self._schedule_wake(wait)
+            return False
+        if self.request_bucket:
+            self.request_bucket.take(1)
+        if self.token_bucket and tokens:
+            self.token_bucket.take(tokens)
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        return True
+
+    def _schedule_wake(self, delay: float):
+        loop = asyncio.get_running_loop()
+        # A timer left on a previous (closed) loop will never fire
+        if self._wake_handle is None or self._wake_loop is not loop:
+            self._wake_handle = loop.call_later(delay, self._on_timer)
+            self._wake_loop = loop
+
+    def _on_timer(self):
+        self._wake_handle = None
+        self._wake()
+
+    def _wake(self):
+        """Admit waiters in priority order while there is capacity."""
+        while self._waiters:
+            _, _, future, tokens = self._waiters[0]
+            if future.done():  # cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if not self._try_admit(tokens):
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def adjust_tokens(self, delta: float):
+        """Correct the token budget once the real usage of a call is known."""
+        if self.token_bucket and delta:
+            self.token_bucket.take(delta)
+
+    def _observe_latency(self, priority: int, latency: float):
+        """
+        Nudge the running median up or down by a small relative step, so outliers barely move it.
+        It starts from the mean of the warmup samples rather than whatever the first call took.
+        """
+        self._latency_samples[priority] += 1
+        samples = self._latency_samples[priority]
+        median = self.median_latency.get(priority, 0.0)
+        if samples <= LATENCY_WARMUP:
+            self.median_latency[priority] = median + (latency - median) / samples
+        elif latency > median:
+            self.median_latency[priority] = median * (1 + MEDIAN_STEP)
+        elif latency < median:
+            self.median_latency[priority] = median * (1 - MEDIAN_STEP)
+
+    def effective_latency_target(self, priority: int = DEFAULT_PRIORITY) -> Optional[float]:
+        """The configured target, or a multiple of the priority's observed median once there are enough samples."""
+        if self.latency_target:
+            return self.latency_target
+        if self._latency_samples[priority] < LATENCY_WARMUP:
+            return None
+        return LATENCY_TOLERANCE * self.median_latency[priority]
+
+    def record_success(self, latency: float, priority: int = DEFAULT_PRIORITY):
+        target = self.effective_latency_target(priority)
+        self._observe_latency(priority, latency)
+        if target and latency > target:
+            self._decrease(0.9)
+            self.stats["slow"] += 1
+        else:
+            # Additive increase: about +1 per window of concurrency_limit successful calls
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+        self._wake()
+
+    def record_throttle(self):
+        self.stats["throttled"] += 1
+        self._decrease(0.5)
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * factor)
+
+    def snapshot(self) -> Dict:
+        return {
+            "concurrency_limit": round(self.concurrency_limit, 2),
+            "latency_target": self.latency_target,
+            "median_latency": {priority: round(median, 3) for priority, median in sorted(self.median_latency.items())},
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            **self.stats
+        }
+
+class Slot:
+    """Handle for an admitted call; mark throttled or set the actual token usage before it exits."""
+    def __init__(self, limiter: EndpointLimiter, tokens: float):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.throttled = False
+
+    def set_tokens(self, actual: float):
+        self.limiter.adjust_tokens(actual - self.tokens)
+        self.tokens = actual
+
+class Scheduler:
+    """Process-wide registry of endpoint limiters shared by every orchestrator and Lilac client."""
+    def __init__(self):
+        self.limiters = {}
+        self._lock = threading.Lock()
+
+    def configure(self, endpoint: str, **kwargs) -> EndpointLimiter:
+        """Replace the limiter for an endpoint, e.g. configure("openai", requests_per_minute=500)."""
+        with self._lock:
+            self.limiters[endpoint] = EndpointLimiter(endpoint, **kwargs)
+            return self.limiters[endpoint]
+
+    def limiter(self, endpoint: str) -> EndpointLimiter:
+        with self._lock:
+            if endpoint not in self.limiters:
+                self.limiters[endpoint] = EndpointLimiter(endpoint)
+            return self.limiters[endpoint]
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str, priority: int = DEFAULT_PRIORITY, tokens: float = 0):
+        """Wait for admission, then record the outcome (success latency or 429) for AIMD."""
+        limiter = self.limiter(endpoint)
+        await limiter.acquire(priority, tokens)
+        handle = Slot(limiter, tokens)
+        start = time.monotonic()
+        try:
+            yield handle
+        except Exception as e:
+            if is_throttle(e):
+                limiter.record_throttle()
+            raise
+        else:
+            if handle.throttled:
+                limiter.record_throttle()
+            else:
+                limiter.record_success(time.monotonic() - start, priority)
+        finally:
+            limiter.release()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+_scheduler = Scheduler()
+
+def get_scheduler() -> Scheduler:
+    return _scheduler
@@ -0,0 +1,262 @@
+"""
+Run large simulation batches across processes (and machines) from a shared SQLite work queue.
+
+    python src/sharded_runner.py run --simulations 2000 --level complex --processes 8 --workers 5
+    python src/sharded_runner.py worker --queue runs/queue.sqlite      # join from another machine
+    python src/sharded_runner.py summary --queue runs/queue.sqlite
+
+Each task is one simulation with its own goal seed. Worker processes claim tasks, run them
+with up to --workers conversations in flight on one event loop and one Lilac client, and
+stream results to their own JSONL file next to the queue.
+
+To resume an interrupted run, pass --resume (or start workers on the same queue): finished tasks
+are never rerun, and tasks left running by a dead worker are reclaimed once their lease expires.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from conversation_orchestrator import close_shared_openai_client
+from lilac_api_client import LilacApiClient, configure_pool, close_shared_http_client
+from log_pipeline import configure_logging, shutdown_logging
+from journal import DEFAULT_LEASE_SECONDS
+from main import run_simulation
+from metrics import get_metrics, merge_files
+from results_sink import ResultsSink, read_results
+
+DEFAULT_QUEUE_PATH = os.path.join("runs", "queue.sqlite")
+
+class WorkQueue:
+    """
+    Durable queue of simulation tasks in a SQLite file, shared by every process that opens it.
+    Claims run in an immediate transaction, so each task goes to exactly one worker. Methods
+    may be called from any thread; calls on one WorkQueue are serialized.
+    """
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, complexity TEXT NOT NULL, seed INTEGER NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, claimed_at REAL, finished_at REAL, "
+            "success INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id)")
+
+    def enqueue(self, num_simulations: int, complexity: str = "simple", seed: int = 0) -> int:
+        """Add tasks with seeds seed, seed+1, ...; returns how many were added."""
+        rows = [(complexity, seed + i) for i in range(num_simulations)]
+        with self._transaction():
+            self._conn.executemany("INSERT INTO tasks (complexity, seed) VALUES (?, ?)", rows)
+        return len(rows)
+
+    def claim(self, worker: str, limit: int = 1) -> List[Dict]:
+        """
+        Mark up to limit tasks as running for worker and return them: pending tasks, and tasks
+        whose worker has held them longer than the lease (it crashed or hung), so a rerun resumes.
+        """
+        with self._transaction():
+            rows = self._conn.execute(
+                "SELECT id, complexity, seed FROM tasks WHERE status = 'pending' "
+                "OR (status = 'running' AND claimed_at < ?) ORDER BY id LIMIT ?",
+                (time.time() - self.lease_seconds, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE tasks SET status = 'running', worker = ?, claimed_at = ? WHERE id = ?",
+                [(worker, time.time(), row[0]) for row in rows]
+            )
+        return [{"id": row[0], "complexity": row[1], "seed": row[2]} for row in rows]
+
+    def complete(self, task_id: int, success: bool):
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE tasks SET status = 'done', success = ?, finished_at = ? WHERE id = ? AND status != 'done'",
+                (int(success), time.time(), task_id)
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            counts["successful"] = self._conn.execute("SELECT COUNT(*) FROM tasks WHERE success = 1").fetchone()[0]
+        return counts
+
+    def workers(self) -> List[str]:
+        """Workers that have claimed tasks from this queue."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT worker FROM tasks WHERE worker IS NOT NULL").fetchall()
+        return sorted(row[0] for row in rows)
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def close(self):
+        self._conn.close()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, taking the write lock up front so concurrent claims serialize."""
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+def _run_dir(queue_path: str) -> str:
+    return os.path.dirname(os.path.abspath(queue_path))
+
+async def _worker_loop(queue_path: str, worker_id: str, max_workers: int, orchestrator_kwargs: Optional[Dict]):
+    work_queue = WorkQueue(queue_path)
+    run_dir = _run_dir(queue_path)
+    configure_pool(max_workers)
+    lilac_client = LilacApiClient()
+    sink = ResultsSink(os.path.join(run_dir, f"results-{worker_id}.jsonl"))
+    in_flight = set()
+
+    async def run_task(task):
+        try:
+            success = await run_simulation(task["complexity"], orchestrator_kwargs, lilac_client=lilac_client,
+                                           sink=sink, simulation_id=task["id"], verbose=False, seed=task["seed"])
+        except Exception as e:
+            await sink.awrite({"simulation": task["id"], "complexity": task["complexity"], "seed": task["seed"],
+                        "match": False, "error": repr(e)})
+            success = False
+        # Queue writes wait on other processes' transactions, so keep them off the event loop
+        await asyncio.to_thread(work_queue.complete, task["id"], success)
+
+    try:
+        while True:
+            # Claim only as many tasks as there are free slots, so other workers get the rest
+            tasks = await asyncio.to_thread(work_queue.claim, worker_id, max_workers - len(in_flight))
+            if not tasks and not in_flight:
+                break
+            for task in tasks:
+                in_flight.add(asyncio.ensure_future(run_task(task)))
+            if in_flight:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        await close_shared_http_client()
+        await close_shared_openai_client()
+        sink.close()
+        work_queue.close()
+        get_metrics().export(os.path.join(run_dir, f"metrics-{worker_id}.json"))
+
+def run_worker(queue_path: str = DEFAULT_QUEUE_PATH, max_workers: int = 5, orchestrator_kwargs: Optional[Dict] = None,
+               worker_id: Optional[str] = None):
+    """Consume tasks until the queue is drained; safe to run from any number of processes or hosts."""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    configure_logging(os.path.join(_run_dir(queue_path), "logs"), run_name=f"worker-{worker_id}")
+    try:
+        asyncio.run(_worker_loop(queue_path, worker_id, max_workers, orchestrator_kwargs))
+    finally:
+        shutdown_logging()
+
+def run_sharded(num_simulations: int = 100, processes: Optional[int] = None, max_workers: int = 5,
+                level: str = "simple", seed: int = 0, queue_path: str = DEFAULT_QUEUE_PATH,
+                orchestrator_kwargs: Optional[Dict] = None, resume: bool = False):
+    """
+    Enqueue num_simulations tasks and drain the queue with a pool of worker processes,
+    each running max_workers conversations at a time. orchestrator_kwargs must be picklable.
+    With resume=True nothing is enqueued and the workers finish the tasks already in the queue.
+    """
+    start_time = time.time()
+    work_queue = WorkQueue(queue_path)
+    try:
+        if not resume:
+            if sum(work_queue.counts().values()):
+                raise ValueError(f"Queue {queue_path} already has tasks; pass resume=True to finish them "
+                                 "or use a new queue path")
+            work_queue.enqueue(num_simulations, level, seed)
+    finally:
+        work_queue.close()
+
+    processes = processes or os.cpu_count() or 1
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(queue_path, max_workers, orchestrator_kwargs))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    print_summary(queue_path, time.time() - start_time)
+
+def print_summary(queue_path: str = DEFAULT_QUEUE_PATH, duration: Optional[float] = None):
+    """Merged summary over the queue and the results and metrics files of the workers that ran its tasks."""
+    run_dir = _run_dir(queue_path)
+    work_queue = WorkQueue(queue_path)
+    counts = work_queue.counts()
+    workers = work_queue.workers()
+    work_queue.close()
+
+    turns = errors = 0
+    prompt_tokens = completion_tokens = 0
+    for worker in workers:
+        path = os.path.join(run_dir, f"results-{worker}.jsonl")
+        if not os.path.exists(path):
+            continue
+        for record in read_results(path):
+            errors += "error" in record
+            turns += record.get("timings", {}).get("turns", 0)
+            prompt_tokens += record.get("usage", {}).get("prompt_tokens", 0)
+            completion_tokens += record.get("usage", {}).get("completion_tokens", 0)
+
+    done = counts.get("done", 0)
+    print(f"\n=== Final Summary ===")
+    print(f"Tasks: {json.dumps(counts)}")
+    print(f"Successful: {counts['successful']} of {done} finished ({errors} errors)")
+    print(f"Turns: {turns}, tokens: {prompt_tokens} prompt / {completion_tokens} completion")
+    if duration:
+        print(f"Total time: {duration:.2f} seconds ({done / duration:.2f} simulations/second)")
+    print(f"\n=== Call Sites ===")
+    print(merge_files([os.path.join(run_dir, f"metrics-{worker}.json") for worker in workers]).report())
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded simulation runner over a SQLite work queue")
+    parser.add_argument("command", choices=["run", "worker", "summary"])
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="queue file; results and metrics go beside it")
+    parser.add_argument("--simulations", type=int, default=100)
+    parser.add_argument("--level", default="simple", choices=["simple", "medium", "complex"])
+    parser.add_argument("--seed", type=int, default=0, help="goal seed of the first task")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--workers", type=int, default=5, help="conversations in flight per process")
+    parser.add_argument("--pacing", default=None, help="pacing policy, e.g. none, fixed:1, human")
+    parser.add_argument("--resume", action="store_true", help="run: finish the tasks already in the queue")
+    args = parser.parse_args()
+
+    orchestrator_kwargs = {"pacing": args.pacing} if args.pacing else None
+    if args.command == "run":
+        run_sharded(args.simulations, args.processes, args.workers, args.level, args.seed, args.queue,
+                    orchestrator_kwargs, args.resume)
+    elif args.command == "worker":
+        run_worker(args.queue, args.workers, orchestrator_kwargs)
+    else:
+        print_summary(args.queue)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import re
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, ValidationError
+
+class TurnAnalysis(BaseModel):
+    """Schema for the single structured per-turn classifier call."""
+    needs_response: bool
+    conversation_ending: bool
+    answered_questions: List[int]
+    item_completed: bool
+    next_state: Literal["GREET", "QUESTION", "ORDER", "CLARIFY", "PRE-DONE", "DONE"]
+
+SYSTEM_PROMPT = """
+You are analyzing one turn of a drive-through conversation between a CUSTOMER and restaurant STAFF.
+Respond with only a JSON object with exactly these fields:
+
+{
+  "needs_response": true if the staff message asks the customer something about a specific item in their order,
+  "conversation_ending": true if the staff message ends the conversation,
+  "answered_questions": indices of the pending staff questions the customer message adequately answered,
+  "item_completed": true if the item being built matches the intended item (formatting can be different),
+  "next_state": one of "GREET", "QUESTION", "ORDER", "CLARIFY", "PRE-DONE", "DONE"
+}
+
+needs_response examples:
+- true: "What size drink would you like?", "Would you like any toppings on that?", "Do you want that as a meal or a la carte?"
+- false: "I've added that to your order", "Would you like anything else?", "Your total is $15.99", "Please pull forward"
+
+conversation_ending examples:
+- true: "Please pull forward. Thanks!", "See you at the window!", "Your total is $X. Please pull forward."
+- false: "Would you like anything else?", "What size would you like?", "I've added that to your order."
+
+answered_questions: "Yes, please" or "Medium" answer a question, "How much are they?" does not.
+
+item_completed: the names of the specific items should be the same. The structure and ordering doesn't matter. But all the actual items should be there.
+False if there is no item being built.
+
+next_state:
+1. If the conversation is ending, DONE
+2. If the staff message needs a response or a question is pending, CLARIFY
+3. If items remain to be ordered, ORDER should be prioritized
+4. If information is needed, QUESTION is appropriate
+5. If all items are ordered, PRE-DONE is appropriate
+"""
+
+def build_user_prompt(fields: Dict[str, str], user_message: str, agent_message: str, questions: List[str],
+                      current_state: str) -> str:
+    """Build the user prompt from the encoded conversation context (prompt_encoding.encode_context) and the latest exchange."""
+    numbered_questions = "\n".join(f"{i}: {question}" for i, question in enumerate(questions)) or "none"
+    return f"""
+    Current state: {current_state}
+    Remaining items to order: {fields['order_goal']}
+    Intended item: {fields['current_item']}
+    Item being built: {fields['items_in_progress']}
+    Ordered items: {fields['ordered_items']}
+    Pending staff questions:
+    {numbered_questions}
+
+    Customer message: {user_message}
+    Staff message: {agent_message}
+    """
+
+def parse_turn_analysis(text: str, num_questions: int) -> Optional[TurnAnalysis]:
+    """Parse and validate the model output, returning None if it doesn't match the schema."""
+    # Models sometimes wrap JSON in a code fence or add a sentence around it
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        analysis = TurnAnalysis.model_validate(json.loads(match.group(0)))
+    except (json.JSONDecodeError, ValidationError):
+        return None
+    if any(i < 0 or i >= num_questions for i in analysis.answered_questions):
+        return None
+    return analysis